@@ -6,50 +6,7 @@ import os
 from pystride.Event import Event, EventType
 from pystride.PyController import PyController
 
-
-def trackCases(simulator, event):
-    """
-        Callback function to track cumulative cases
-        after each time-step.
-    """
-
-    outputPrefix = simulator.GetConfigValue("run.output_prefix")
-    timestep = event.timestep
-    cases = simulator.GetPopulation().GetInfectedCount()
-
-    with open(os.path.join(outputPrefix, "cases.csv"), "a") as csvfile:
-        fieldnames = ["timestep", "cases"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if timestep == 0:
-            writer.writeheader()
-        writer.writerow({"timestep": timestep, "cases": cases})
-
-def vaccinateStudents(simulator, event):
-    """
-        Callback function that sets people in the College pool immune after a week
-    """
-    outputPrefix = simulator.GetConfigValue("run.output_prefix")
-    timestep = event.timestep
-    cases = simulator.GetPopulation().GetInfectedCount()
-
-    if (timestep >= 6): #dag0 is ook een dag
-        pop = simulator.GetPopulation()
-        for pIndex in range(pop.size()):
-            # college = stride::ContactType::Id()
-
-            test = pop[pIndex].GetPoolId(2) #nummer 2 geeft de PoolId's voor College's
-                                            #wanneer als de persoon niet tot deze pool behoort geeft deze 0
-            if test != 0 and pop[pIndex].IsInPool(test):
-                if 18 <= pop[pIndex].GetAge() <= 26: #technisch gezien niet nodig, maar toch...
-                    pop[pIndex].GetHealth().SetImmune()
-
-
-    with open(os.path.join(outputPrefix, "cases.csv"), "a") as csvfile:
-        fieldnames = ["timestep", "cases"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if timestep == 0:
-            writer.writeheader()
-        writer.writerow({"timestep": timestep, "cases": cases})
+from SimCallbacks import CaseTracker, TargetedVaccination
 
 def plotNewCases(outputPrefix, vaccinationLevels):
     """
@@ -91,9 +48,9 @@ def runSimulation(outputPrefix, vaccinated):
     control.runConfig.setParameter("vaccine_profile", "None")
 
     if(vaccinated):
-        control.registerCallback(vaccinateStudents, EventType.Stepped)
-    else:
-        control.registerCallback(trackCases, EventType.Stepped)
+        # Set the persons in a College pool (pool type 2) immune after a week (day 0 is a day too)
+        TargetedVaccination(6, 2, minAge=18, maxAge=26).register(control)
+    CaseTracker().register(control)
 
     # Run simulation
     control.control()
@@ -1,27 +1,9 @@
 import csv
 import matplotlib.pyplot as plt
-from matplotlib import pyplot as mp
 import os
 
-from pystride.Event import Event, EventType
-from pystride.PyController import PyController
-
-
-def trackCases(simulator, event):
-    """
-        Callback function to track cumulative cases
-        after each time-step.
-    """
-    outputPrefix = simulator.GetConfigValue("run.output_prefix")
-    timestep = event.timestep
-    cases = simulator.GetPopulation().GetInfectedCount()
-
-    with open(os.path.join(outputPrefix, "cases.csv"), "a") as csvfile:
-        fieldnames = ["timestep", "cases"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if timestep == 0:
-            writer.writeheader()
-        writer.writerow({"timestep": timestep, "cases": cases})
+from SimCallbacks import CaseTracker, getMaxInfectionDays, runControl
+from SweepRunner import generateGeoPopulation, getController, importGeoPopulation, releaseController, runSweep
 
 
 def plotNewCases(outputPrefix, vaccinationLevels):
@@ -49,21 +31,27 @@ def plotNewCases(outputPrefix, vaccinationLevels):
     plt.show()
 
 
-def runSimulation(outputPrefix, commutingLevel):
-    # Set up simulator
-    control = PyController(data_dir="data")
-    # Load configuration from file
-    control.loadRunConfig(os.path.join("config", "2.3.xml"))
+def runSimulation(outputPrefix, commutingLevel, numThreads=None):
+    configFile = os.path.join("config", "2.3.xml")
+    # The geopopulation depends on the commuting level, it is generated once
+    # per level and imported by every run with that level
+    geopopFile = generateGeoPopulation(outputPrefix + "_" + str(commutingLevel) + "_geopop.proto",
+                                       {"geopop_gen.fraction_workplace_commuters": commutingLevel},
+                                       configFile)
+    # Set up simulator and load configuration from file
+    quietDays = getMaxInfectionDays(os.path.join("data", "disease_measles.xml"))
+    control = getController(configFile, setup=CaseTracker(quietDays=quietDays).register)
+    importGeoPopulation(control, geopopFile)
     # Set some parameters
     control.runConfig.setParameter("output_cases", "false")
     control.runConfig.setParameter("contact_output_file", "false")
     control.runConfig.setParameter("output_prefix", outputPrefix + "_" + str(commutingLevel))
     control.runConfig.setParameter("seeding_rate", 0.00000334)  # Seed 2 infected persons in population of 600 000
-    control.registerCallback(trackCases, EventType.Stepped)
+    if numThreads:
+        control.runConfig.setParameter("num_threads", numThreads)
     # control.runConfig._etree.
-    control.runConfig.setParameter("geopop_gen.fraction_workplace_commuters", commutingLevel)
-    # Run simulation
-    control.control()
+    # Run simulation, stopping once the outbreak has died out
+    runControl(control, onStop=releaseController)
 
 
 def main():
@@ -83,15 +71,9 @@ def main():
     print(commutingLevels)
 
 
-    for nr in commutingLevels:
-        try:  # FIRST DELETE DIRECTORY FILES, BEFORE ADDING VALUES
-            os.remove(outputPrefix + '_' + str(nr) + '/cases.csv')
-        except OSError:
-            pass
-
-    # Run simulations
-    for v in commutingLevels:
-        runSimulation(outputPrefix, v)
+    # Run simulations, runs that were completed before are skipped
+    runSweep(runSimulation, {"outputPrefix": [outputPrefix], "commutingLevel": commutingLevels},
+             outputPrefix + "_sweep.jsonl")
     # Post-processing
     plotNewCases(outputPrefix, commutingLevels)
 
@@ -0,0 +1,130 @@
+import csv
+import math
+import os
+
+import numpy as np
+
+from .ConfidenceIntervals import getProportionInterval, getZValue
+from .ScenarioSummary import clearScenarioSummaries, getFinalSize
+from .Util import mapTasks
+
+def readSeeds(outputDir, scenarioName):
+    """
+        Seeds in the seeds file of a scenario, or an empty list
+        if the scenario has not been run yet.
+    """
+    seeds = []
+    seedsFile = os.path.join(outputDir, scenarioName + "_seeds.csv")
+    if os.path.isfile(seedsFile):
+        with open(seedsFile) as csvfile:
+            for row in csv.reader(csvfile):
+                seeds += [int(s) for s in row]
+    return seeds
+
+def appendSeeds(outputDir, scenarioName, seeds):
+    with open(os.path.join(outputDir, scenarioName + "_seeds.csv"), "a") as csvfile:
+        csv.writer(csvfile).writerow(seeds)
+
+def isOutbreak(outputDir, scenarioName, seed, numDays, extinctionThreshold):
+    # Runs that stopped early count with their last cumulative cases
+    return getFinalSize(outputDir, scenarioName, seed, numDays) >= extinctionThreshold
+
+def _runSeed(runFunc, outputDir, scenarioName, seed, numDays, extinctionThreshold):
+    runFunc(outputDir, scenarioName, seed)
+    return isOutbreak(outputDir, scenarioName, seed, numDays, extinctionThreshold)
+
+def getNumRunsNeeded(numOutbreaks, numRuns, targetWidth, confidenceLevel=95):
+    """
+        Rough number of runs for which the confidence interval of the fraction
+        of outbreaks would be targetWidth wide, using the normal approximation
+        with an adjusted estimate of the fraction (that is never 0 or 1).
+    """
+    z = getZValue(confidenceLevel)
+    p = (numOutbreaks + 2) / (numRuns + 4)
+    return math.ceil(4 * z ** 2 * p * (1 - p) / targetWidth ** 2)
+
+def newSeeds(rng, numSeeds, usedSeeds):
+    seeds = []
+    while len(seeds) < numSeeds:
+        seed = int(rng.randint(1, 2 ** 31 - 1))
+        if seed not in usedSeeds:
+            usedSeeds.add(seed)
+            seeds.append(seed)
+    return seeds
+
+def sampleOutbreakFractions(runFunc, outputDir, scenarioNames, numDays, extinctionThreshold, poolSize,
+                            targetWidth=0.1, batchSize=10, maxSeeds=500, maxRuns=None,
+                            confidenceLevel=95, method="wilson", rngSeed=None):
+    """
+        Run seeds of every scenario in batches until the confidence interval
+        ("wilson" or "clopper-pearson") of its fraction of outbreaks is at
+        most targetWidth wide, or it has maxSeeds runs.
+        Every round only the scenarios whose interval is still too wide get
+        new seeds, as many as they are estimated to need (at most batchSize),
+        and the runs of all these scenarios share one task queue. With the
+        scenarios of an R0 x year grid (see getGridScenarioNames), runs thus
+        go to the borderline cells instead of the ones that are already clear.
+        At most maxRuns new runs are done in total.
+
+        runFunc(outputDir, scenarioName, seed) runs one simulation with its
+        output in outputDir/<scenarioName>_<seed>. The seeds of a scenario
+        are appended to its seeds file, and seeds that were already in it are
+        reused, so the usual plots work on the sampled scenarios and sampling
+        can be resumed.
+        Returns a dictionary of scenario -> (number of outbreaks, number of runs,
+        (lower, upper)).
+    """
+    rng = np.random.RandomState(rngSeed)
+    seeds = {}
+    numOutbreaks = {}
+    argsList = []
+    for scenarioName in scenarioNames:
+        seeds[scenarioName] = readSeeds(outputDir, scenarioName)
+        argsList += [(outputDir, scenarioName, s, numDays, extinctionThreshold) for s in seeds[scenarioName]]
+    outbreaks = mapTasks(isOutbreak, argsList, poolSize) if argsList else []
+    for scenarioName in scenarioNames:
+        numOutbreaks[scenarioName] = 0
+    for args, outbreak in zip(argsList, outbreaks):
+        numOutbreaks[args[1]] += int(outbreak)
+
+    def getInterval(scenarioName):
+        return getProportionInterval(numOutbreaks[scenarioName], len(seeds[scenarioName]),
+                                     confidenceLevel, method)
+
+    numNewRuns = 0
+    while maxRuns is None or numNewRuns < maxRuns:
+        # Scenarios with the widest intervals go first
+        widths = {}
+        for scenarioName in scenarioNames:
+            lower, upper = getInterval(scenarioName)
+            if upper - lower > targetWidth and len(seeds[scenarioName]) < maxSeeds:
+                widths[scenarioName] = upper - lower
+        if len(widths) == 0:
+            break
+        tasks = []
+        for scenarioName in sorted(widths, key=widths.get, reverse=True):
+            numRuns = len(seeds[scenarioName])
+            numNeeded = getNumRunsNeeded(numOutbreaks[scenarioName], numRuns, targetWidth, confidenceLevel) - numRuns
+            numSeeds = min(max(numNeeded, 1), batchSize, maxSeeds - numRuns)
+            if maxRuns is not None:
+                numSeeds = min(numSeeds, maxRuns - numNewRuns - len(tasks))
+            usedSeeds = set(seeds[scenarioName])
+            for seed in newSeeds(rng, numSeeds, usedSeeds):
+                tasks.append((runFunc, outputDir, scenarioName, seed, numDays, extinctionThreshold))
+        if len(tasks) == 0:
+            break
+        print("Adaptive sampling: {} runs for {} scenarios".format(len(tasks), len(widths)))
+        outbreaks = mapTasks(_runSeed, tasks, poolSize)
+        batches = {}
+        for task, outbreak in zip(tasks, outbreaks):
+            scenarioName, seed = task[2], task[3]
+            batches.setdefault(scenarioName, []).append(seed)
+            numOutbreaks[scenarioName] += int(outbreak)
+        for scenarioName, batch in batches.items():
+            appendSeeds(outputDir, scenarioName, batch)
+            seeds[scenarioName] += batch
+        numNewRuns += len(tasks)
+    # Summaries read before sampling lack the new seeds
+    clearScenarioSummaries()
+    return {scenarioName: (numOutbreaks[scenarioName], len(seeds[scenarioName]), getInterval(scenarioName))
+            for scenarioName in scenarioNames}
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from .Util import MAX_AGE
+
+def readColumns(csvFile, columns):
+    """
+        Load the given columns of a per-person csv file as NumPy arrays.
+    """
+    data = pd.read_csv(csvFile, usecols=columns)
+    return [data[c].to_numpy() for c in columns]
+
+def countByAge(ages, flags=None):
+    """
+        Number of persons per age (0 to MAX_AGE),
+        only counting persons whose flag is set when flags are given.
+    """
+    ages = ages.astype(int)
+    if flags is not None:
+        ages = ages[flags.astype(bool)]
+    return np.bincount(ages, minlength=MAX_AGE + 1)
+
+def divideByAge(counts, totals):
+    """
+        Element-wise counts / totals, 0 for ages without persons.
+    """
+    fractions = np.zeros(len(counts))
+    np.divide(counts, totals, out=fractions, where=(totals > 0))
+    return fractions
+
+def getAgeCounts(outputDir, scenarioName, seed):
+    """
+        Totals, susceptibles and infected by age of one run, from a single
+        read of each file. The infected are counted by the ages in
+        infected.csv, so it need not list the persons in the same order
+        as susceptibles.csv.
+    """
+    runDir = os.path.join(outputDir, scenarioName + "_" + str(seed))
+    ages, susceptible = readColumns(os.path.join(runDir, "susceptibles.csv"), ["age", "susceptible"])
+    infectedAges, infected = readColumns(os.path.join(runDir, "infected.csv"), ["age", "infected"])
+    totalsByAge = countByAge(ages)
+    susceptiblesByAge = countByAge(ages, susceptible)
+    infectedByAge = countByAge(infectedAges, infected)
+    return totalsByAge.tolist(), susceptiblesByAge.tolist(), infectedByAge.tolist()
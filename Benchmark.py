@@ -0,0 +1,233 @@
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import sys
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .AgeImmunity import createAgeImmunityPlot
+from .EffectiveR import getEffectiveR
+from .InfectedByAge import createInfectedByAgePlot
+from .OutbreakOccurrenceAndSize import createFinalSizesOverviewPlots
+from .ResultCache import setCacheOptions
+from .ScenarioSummary import clearScenarioSummaries
+from .Util import closePools, mapOverSeeds, MAX_AGE
+
+# Benchmarks of the analysis entry points on a synthetic output tree with the
+# layout of the simulation scripts:
+#   <scenario>_seeds.csv                 rng seeds of the scenario
+#   <scenario>_<seed>/cases.csv          cumulative cases per time-step
+#   <scenario>_<seed>/susceptibles.csv   age and susceptibility per person
+#   <scenario>_<seed>/infected.csv       age and infection per person
+#   <scenario>_<seed>_contact_log.txt    [TRAN] record per infection
+# The scenarios are named <scenario>_R0_<R0> so the overview plots can be run.
+# Every benchmark runs in a fresh process with its own worker pool, like the
+# analysis scripts, so its peak memory is the maximum resident set size of
+# that process and its workers (which getrusage only reports per process
+# tree, and never lowers). The result cache is disabled before the processes
+# are started, so every repeat recomputes all results.
+
+SCENARIO_NAMES = ["1", "2"]
+
+R0S = [12, 14]
+
+EXTINCTION_THRESHOLD = 10
+
+def writeScenario(outputDir, scenarioName, numSeeds, numPersons, numDays, rng):
+    """
+        Write the output of numSeeds synthetic runs of a scenario. About
+        half of the runs die out, the others grow logistically up to a
+        random fraction of the susceptibles.
+    """
+    seeds = set()
+    while len(seeds) < numSeeds:
+        seeds.add(int(rng.randint(1, 2 ** 31)))
+    seeds = sorted(seeds)
+    with open(os.path.join(outputDir, scenarioName + "_seeds.csv"), "w") as f:
+        f.write(",".join(str(s) for s in seeds) + "\n")
+    ids = np.arange(numPersons)
+    for seed in seeds:
+        runDir = os.path.join(outputDir, scenarioName + "_" + str(seed))
+        os.makedirs(runDir, exist_ok=True)
+        ages = rng.randint(0, MAX_AGE + 1, size=numPersons)
+        susceptible = (rng.random_sample(numPersons) < 0.05 + 0.3 * (ages < 10)).astype(int)
+        finalSize = 0
+        if rng.random_sample() < 0.5:
+            finalSize = int(rng.randint(0, EXTINCTION_THRESHOLD))
+        else:
+            finalSize = int(rng.uniform(0.2, 0.9) * susceptible.sum())
+        finalSize = min(finalSize, int(susceptible.sum()))
+        days = np.arange(numDays)
+        curve = 1 / (1 + np.exp(-(days - numDays / 3) / (numDays / 20)))
+        cases = np.maximum.accumulate(np.round(1 + finalSize * curve)).astype(np.int64)
+        np.savetxt(os.path.join(runDir, "cases.csv"), np.column_stack([days, cases]),
+                   fmt="%d", delimiter=",", header="timestep,cases", comments="")
+        np.savetxt(os.path.join(runDir, "susceptibles.csv"), np.column_stack([ids, ages, susceptible]),
+                   fmt="%d", delimiter=",", header="id,age,susceptible", comments="")
+        infected = np.zeros(numPersons, dtype=int)
+        infectedIds = rng.choice(np.flatnonzero(susceptible), size=cases[-1] - 1, replace=False)
+        infected[infectedIds] = 1
+        np.savetxt(os.path.join(runDir, "infected.csv"), np.column_stack([ids, ages, infected]),
+                   fmt="%d", delimiter=",", header="id,age,infected", comments="")
+        infectors = rng.choice(np.concatenate([[0], infectedIds]), size=len(infectedIds))
+        infectionDays = np.searchsorted(cases, np.arange(2, len(infectedIds) + 2))
+        with open(os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt"), "w") as f:
+            for i, j, day in zip(infectedIds, infectors, infectionDays):
+                f.write("[TRAN] {} {} {} {}\n".format(i, j, rng.randint(0, 6), day))
+    return seeds
+
+def createSyntheticOutput(outputDir, numSeeds=20, numPersons=10000, numDays=100, rngSeed=0):
+    """
+        Write a synthetic output tree (see above) with numSeeds runs of
+        numPersons persons and numDays days for every scenario.
+    """
+    os.makedirs(outputDir, exist_ok=True)
+    rng = np.random.RandomState(rngSeed)
+    for R0 in R0S:
+        for scenarioName in SCENARIO_NAMES:
+            writeScenario(outputDir, scenarioName + "_R0_" + str(R0), numSeeds, numPersons, numDays, rng)
+
+def getBenchmarks(outputDir, numDays, poolSize):
+    """
+        Name and function of every benchmark.
+    """
+    scenarioNames = [s + "_R0_" + str(R0S[0]) for s in SCENARIO_NAMES]
+    allScenarioNames = [s + "_R0_" + str(R0) for R0 in R0S for s in SCENARIO_NAMES]
+    return [
+        ("createFinalSizesOverviewPlots", lambda: createFinalSizesOverviewPlots(
+            outputDir, R0S, SCENARIO_NAMES, SCENARIO_NAMES, numDays, EXTINCTION_THRESHOLD, poolSize)),
+        ("createAgeImmunityPlot", lambda: createAgeImmunityPlot(
+            outputDir, scenarioNames, SCENARIO_NAMES, poolSize, "BenchmarkAgeImmunity")),
+        ("createInfectedByAgePlot", lambda: createInfectedByAgePlot(
+            outputDir, scenarioNames[0], EXTINCTION_THRESHOLD, poolSize, "BenchmarkInfectedByAge")),
+        ("getEffectiveR", lambda: mapOverSeeds(getEffectiveR, outputDir, allScenarioNames, poolSize)),
+    ]
+
+def timeBenchmark(func, repeats):
+    """
+        Wall-clock seconds of every repeat of func.
+    """
+    seconds = []
+    for _ in range(repeats):
+        clearScenarioSummaries()
+        start = time.perf_counter()
+        func()
+        seconds.append(time.perf_counter() - start)
+        plt.close("all")
+    return seconds
+
+def getMaxRSS(who):
+    """
+        Maximum resident set size in bytes of this process
+        (resource.RUSAGE_SELF) or its finished children (RUSAGE_CHILDREN).
+    """
+    maxRSS = resource.getrusage(who).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return maxRSS if sys.platform == "darwin" else maxRSS * 1024
+
+def runBenchmark(name, outputDir, numDays, poolSize, repeats, conn):
+    """
+        Time repeats of benchmark name on the shared worker pool of this
+        process and send the times and the peak memory of this process and
+        its workers to conn.
+    """
+    try:
+        func = dict(getBenchmarks(outputDir, numDays, poolSize))[name]
+        seconds = timeBenchmark(func, repeats)
+    finally:
+        # Join the workers, so getrusage reports them
+        closePools()
+    peakBytes = max(getMaxRSS(resource.RUSAGE_SELF), getMaxRSS(resource.RUSAGE_CHILDREN))
+    conn.send((seconds, peakBytes))
+    conn.close()
+
+def runBenchmarkProcess(name, outputDir, numDays, poolSize, repeats):
+    """
+        Run benchmark name in a new process (see runBenchmark).
+    """
+    parentConn, childConn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=runBenchmark,
+                                      args=(name, outputDir, numDays, poolSize, repeats, childConn))
+    process.start()
+    childConn.close()
+    try:
+        result = parentConn.recv()
+    except EOFError:
+        result = None
+    process.join()
+    if result is None:
+        raise RuntimeError("Benchmark {} failed with exit code {}".format(name, process.exitcode))
+    return result
+
+def runBenchmarks(outputDir, reportFile, numSeeds=20, numPersons=10000, numDays=100, poolSize=4,
+                  repeats=3, names=None, rngSeed=0):
+    """
+        Create a synthetic output tree in outputDir (unless it was already
+        created with the same configuration), run the benchmarks (all, or
+        only those in names) and write the report to reportFile.
+    """
+    config = {"numSeeds": numSeeds, "numPersons": numPersons, "numDays": numDays, "poolSize": poolSize,
+              "repeats": repeats, "rngSeed": rngSeed}
+    configFile = os.path.join(outputDir, "benchmark_config.json")
+    existingConfig = None
+    if os.path.isfile(configFile):
+        with open(configFile) as f:
+            existingConfig = json.load(f)
+    treeConfig = {k: config[k] for k in ["numSeeds", "numPersons", "numDays", "rngSeed"]}
+    if existingConfig != treeConfig:
+        createSyntheticOutput(outputDir, numSeeds, numPersons, numDays, rngSeed)
+        with open(configFile, "w") as f:
+            json.dump(treeConfig, f)
+    results = {}
+    setCacheOptions(enabled=False)
+    try:
+        for name, _ in getBenchmarks(outputDir, numDays, poolSize):
+            if names is not None and name not in names:
+                continue
+            seconds, peakBytes = runBenchmarkProcess(name, outputDir, numDays, poolSize, repeats)
+            results[name] = {"seconds": seconds, "minSeconds": min(seconds),
+                             "medianSeconds": statistics.median(seconds), "peakBytes": peakBytes}
+            print("{}: {:.3f} s (min of {}), peak {:.1f} MB".format(name, min(seconds), repeats, peakBytes / 1e6))
+    finally:
+        setCacheOptions(enabled=True)
+    report = {
+        "config": config,
+        "environment": {"python": platform.python_version(), "numpy": np.__version__,
+                        "platform": platform.platform(), "cpuCount": os.cpu_count()},
+        "results": results,
+    }
+    with open(reportFile, "w") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def compareReports(baseReportFile, reportFile):
+    """
+        Ratio of the minimum time and the peak memory of every benchmark
+        in reportFile to those in baseReportFile (below 1 is a speedup).
+    """
+    with open(baseReportFile) as f:
+        base = json.load(f)
+    with open(reportFile) as f:
+        report = json.load(f)
+    if base["config"] != report["config"]:
+        print("Warning: the reports were made with different configurations")
+    ratios = {}
+    for name, result in report["results"].items():
+        if name in base["results"]:
+            baseResult = base["results"][name]
+            ratios[name] = {"seconds": result["minSeconds"] / baseResult["minSeconds"],
+                            "peakBytes": result["peakBytes"] / max(1, baseResult["peakBytes"])}
+            print("{}: time x{:.2f}, memory x{:.2f}".format(name, ratios[name]["seconds"],
+                                                             ratios[name]["peakBytes"]))
+    return ratios
+
+if __name__ == "__main__":
+    # python -m <package>.Benchmark <outputDir> <reportFile> [numSeeds] [numPersons]
+    runBenchmarks(sys.argv[1], sys.argv[2], *[int(a) for a in sys.argv[3:5]])
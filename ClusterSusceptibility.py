@@ -0,0 +1,139 @@
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .AgeCounts import readColumns
+from .FileUtil import saveNpzAtomic
+from .Util import mapOverSeeds, saveFig
+
+# Cluster membership of every person is taken from the population file of
+# the runs (e.g. pop_flanders600.csv), which has one row per person, in the
+# order of the person ids, with a cluster id per cluster type (0 when the
+# person is not in a cluster of that type). It is turned into one integer
+# array per cluster type, with the clusters numbered 0..numClusters-1 and
+# -1 for persons without a cluster, and saved in a sidecar index so the
+# population file is only parsed once.
+
+CLUSTER_TYPES = ["household_id", "school_id", "work_id", "primary_community", "secondary_community"]
+
+CLUSTER_TYPE_NAMES = ["Households", "Schools", "Workplaces", "Primary communities", "Secondary communities"]
+
+# Upper bounds of the bins of susceptible fractions
+POCKET_BINS = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1]
+
+# Loaded cluster indices per process, keyed by population file
+_indices = {}
+
+def getClusterIndexFile(popFile):
+    return popFile + ".clusters.npz"
+
+def toClusterIndices(clusterIds):
+    """
+        Renumber the cluster ids of all persons to 0..numClusters-1,
+        -1 for persons with cluster id 0.
+    """
+    clusterIds = np.asarray(clusterIds, dtype=np.int64)
+    indices = np.full(len(clusterIds), -1, dtype=np.int64)
+    members = clusterIds != 0
+    indices[members] = np.unique(clusterIds[members], return_inverse=True)[1]
+    return indices
+
+def buildClusterIndex(popFile, clusterTypes=CLUSTER_TYPES):
+    stat = os.stat(popFile)
+    arrays = {t: toClusterIndices(ids) for t, ids in zip(clusterTypes, readColumns(popFile, clusterTypes))}
+    saveNpzAtomic(getClusterIndexFile(popFile), _size=stat.st_size, _mtime=stat.st_mtime, **arrays)
+    return arrays
+
+def getClusterIndex(popFile, clusterTypes=CLUSTER_TYPES):
+    """
+        Cluster index of every person for each cluster type, read from the
+        sidecar index of the population file, which is (re)built when it is
+        missing or out of date.
+    """
+    key = os.path.abspath(popFile)
+    stat = os.stat(popFile)
+    if key in _indices and _indices[key][0] == (stat.st_size, stat.st_mtime):
+        index = _indices[key][1]
+        if all(t in index for t in clusterTypes):
+            return index
+    index = None
+    indexFile = getClusterIndexFile(popFile)
+    if os.path.isfile(indexFile):
+        with np.load(indexFile) as f:
+            if (int(f["_size"]) == stat.st_size and float(f["_mtime"]) == stat.st_mtime
+                    and all(t in f for t in clusterTypes)):
+                index = {t: f[t] for t in clusterTypes}
+    if index is None:
+        index = buildClusterIndex(popFile, clusterTypes)
+    _indices[key] = ((stat.st_size, stat.st_mtime), index)
+    return index
+
+def getClusterFractions(clusterIndices, flags):
+    """
+        Fraction of the members of every cluster for which flags is set,
+        e.g. the fraction of susceptibles.
+    """
+    members = clusterIndices >= 0
+    numClusters = int(clusterIndices.max()) + 1 if members.any() else 0
+    sizes = np.bincount(clusterIndices[members], minlength=numClusters)
+    counts = np.bincount(clusterIndices[members], weights=flags[members], minlength=numClusters)
+    fractions = np.zeros(numClusters)
+    np.divide(counts, sizes, out=fractions, where=(sizes > 0))
+    return fractions
+
+def toPocketHistogram(fractions, bins=POCKET_BINS):
+    """
+        Fraction of clusters in each bin, a cluster goes into the
+        first bin whose upper bound is not below its fraction.
+    """
+    if len(fractions) == 0:
+        return np.zeros(len(bins))
+    binIndices = np.minimum(np.searchsorted(bins, fractions, side="left"), len(bins) - 1)
+    return np.bincount(binIndices, minlength=len(bins)) / len(fractions)
+
+def getSusceptibleFractionsByCluster(outputDir, scenarioName, seed, popFile, clusterTypes=CLUSTER_TYPES):
+    """
+        Fraction of susceptibles in every cluster of each cluster type at the
+        start of a run, as a dictionary of cluster type -> array.
+    """
+    susceptiblesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "susceptibles.csv")
+    susceptible, = readColumns(susceptiblesFile, ["susceptible"])
+    index = getClusterIndex(popFile, clusterTypes)
+    if len(susceptible) != len(index[clusterTypes[0]]):
+        raise ValueError("{} does not have one row per person of {}".format(susceptiblesFile, popFile))
+    susceptible = susceptible.astype(float)
+    return {t: getClusterFractions(index[t], susceptible) for t in clusterTypes}
+
+def getPocketHistograms(outputDir, scenarioName, seed, popFile, bins=POCKET_BINS):
+    """
+        Distribution of the susceptible fractions of the clusters of each
+        cluster type (CLUSTER_TYPES order) and of all clusters together.
+    """
+    fractions = getSusceptibleFractionsByCluster(outputDir, scenarioName, seed, popFile)
+    histograms = [toPocketHistogram(fractions[t], bins).tolist() for t in CLUSTER_TYPES]
+    allFractions = np.concatenate([fractions[t] for t in CLUSTER_TYPES])
+    return histograms, toPocketHistogram(allFractions, bins).tolist()
+
+def createPocketsOfSusceptiblesPlot(outputDir, scenarioName, popFile, poolSize, figName):
+    """
+        Bar plot of the distribution of the fraction of susceptibles per
+        cluster, for each cluster type, averaged over all seeds of a scenario.
+    """
+    results = mapOverSeeds(getPocketHistograms, outputDir, [scenarioName], poolSize, (popFile,))[0]
+    histograms = np.mean([r[0] for r in results], axis=0)
+    width = 0.015
+    colors = ['red', 'tan', 'lime', 'orange', 'black']
+    for t_i in range(len(CLUSTER_TYPES)):
+        plt.bar([x + t_i * width for x in POCKET_BINS], histograms[t_i], width=width, color=colors[t_i])
+    plt.xlabel("Fraction susceptibles in cluster")
+    plt.ylabel("Fraction of clusters")
+    plt.ylim(0, 1)
+    plt.legend(CLUSTER_TYPE_NAMES)
+    saveFig(outputDir, figName)
+    # Overall distribution over the clusters of all types
+    plt.bar(POCKET_BINS, np.mean([r[1] for r in results], axis=0), width=0.08)
+    plt.xlabel("Fraction susceptibles in cluster")
+    plt.ylabel("Fraction of clusters")
+    plt.ylim(0, 1)
+    saveFig(outputDir, figName + "Overall")
@@ -0,0 +1,93 @@
+import math
+
+# Confidence intervals for a binomial proportion, e.g. the fraction of runs of
+# a scenario that result in an outbreak. Unlike the normal approximation these
+# are valid for any number of successes, including 0 and all trials.
+#
+# The simulation-side ThresholdSearch imports this module as a top-level
+# module, so it must only import from the standard library.
+
+Z_VALUES = {90: 1.645, 95: 1.96, 99: 2.576}
+
+def getZValue(confidenceLevel=95):
+    """
+        z such that P(-z < Z < z) = confidenceLevel / 100 for a standard
+        normal Z, found by bisection on erf for levels not in Z_VALUES.
+    """
+    if confidenceLevel in Z_VALUES:
+        return Z_VALUES[confidenceLevel]
+    lower = 0.0
+    upper = 10.0
+    for _ in range(60):
+        middle = (lower + upper) / 2
+        if math.erf(middle / math.sqrt(2)) < confidenceLevel / 100:
+            lower = middle
+        else:
+            upper = middle
+    return (lower + upper) / 2
+
+def wilsonInterval(numSuccesses, numTrials, confidenceLevel=95):
+    """
+        Wilson score interval (lower, upper) for numSuccesses out of numTrials.
+    """
+    if numTrials == 0:
+        return 0.0, 1.0
+    z = getZValue(confidenceLevel)
+    p = numSuccesses / numTrials
+    denominator = 1 + z ** 2 / numTrials
+    center = (p + z ** 2 / (2 * numTrials)) / denominator
+    halfWidth = z * math.sqrt(p * (1 - p) / numTrials + z ** 2 / (4 * numTrials ** 2)) / denominator
+    return max(0.0, center - halfWidth), min(1.0, center + halfWidth)
+
+def binomialCdf(k, n, p):
+    """
+        P(X <= k) for X ~ Binomial(n, p).
+    """
+    if p <= 0:
+        return 1.0
+    if p >= 1:
+        return 1.0 if k >= n else 0.0
+    logP = math.log(p)
+    logQ = math.log1p(-p)
+    total = 0.0
+    for i in range(k + 1):
+        logTerm = (math.lgamma(n + 1) - math.lgamma(i + 1) - math.lgamma(n - i + 1)
+                   + i * logP + (n - i) * logQ)
+        total += math.exp(logTerm)
+    return min(total, 1.0)
+
+def _bisect(func, target, lower=0.0, upper=1.0, numIterations=60):
+    # func is decreasing in p
+    for _ in range(numIterations):
+        middle = (lower + upper) / 2
+        if func(middle) > target:
+            lower = middle
+        else:
+            upper = middle
+    return (lower + upper) / 2
+
+def clopperPearsonInterval(numSuccesses, numTrials, confidenceLevel=95):
+    """
+        Exact (Clopper-Pearson) interval (lower, upper) for numSuccesses
+        out of numTrials, found by bisection on the binomial distribution.
+    """
+    if numTrials == 0:
+        return 0.0, 1.0
+    alpha = 1 - confidenceLevel / 100
+    lower = 0.0
+    upper = 1.0
+    if numSuccesses > 0:
+        # P(X >= numSuccesses | lower) = alpha / 2
+        lower = _bisect(lambda p: binomialCdf(numSuccesses - 1, numTrials, p), 1 - alpha / 2)
+    if numSuccesses < numTrials:
+        # P(X <= numSuccesses | upper) = alpha / 2
+        upper = _bisect(lambda p: binomialCdf(numSuccesses, numTrials, p), alpha / 2)
+    return lower, upper
+
+INTERVALS = {
+    "wilson": wilsonInterval,
+    "clopper-pearson": clopperPearsonInterval,
+}
+
+def getProportionInterval(numSuccesses, numTrials, confidenceLevel=95, method="wilson"):
+    return INTERVALS[method](numSuccesses, numTrials, confidenceLevel)
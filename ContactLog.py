@@ -0,0 +1,172 @@
+import mmap
+import os
+import re
+
+import numpy as np
+
+from .FileUtil import saveNpzAtomic
+
+# Contact logs consist of lines that start with a tag such as [PART], [CONT]
+# or [TRAN], followed by space-separated fields. The functions below work on
+# the raw bytes, so lines with other tags are never decoded or split.
+
+DEFAULT_TAGS = ["[PART]", "[CONT]", "[TRAN]"]
+
+CHUNK_SIZE = 1 << 24
+
+def _linePrefix(tag):
+    return tag.encode() + b" "
+
+def countTag(logFile, tag, chunkSize=CHUNK_SIZE):
+    """
+        Count the lines of a contact log that start with tag,
+        reading the file in chunks of raw bytes.
+    """
+    prefix = _linePrefix(tag)
+    pattern = b"\n" + prefix
+    count = 0
+    with open(logFile, "rb") as f:
+        chunk = f.read(chunkSize)
+        if chunk.startswith(prefix):
+            count += 1
+        # Keep the end of the previous chunk, a match can span two chunks
+        carry = b""
+        while chunk:
+            data = carry + chunk
+            count += data.count(pattern)
+            carry = data[-(len(pattern) - 1):]
+            chunk = f.read(chunkSize)
+    return count
+
+def findTagOffsets(logFile, tag):
+    """
+        Byte offsets of the lines of a contact log that start with tag.
+    """
+    prefix = _linePrefix(tag)
+    pattern = b"\n" + prefix
+    offsets = []
+    if os.path.getsize(logFile) == 0:
+        return np.array(offsets, dtype=np.int64)
+    with open(logFile, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(prefix)] == prefix:
+                offsets.append(0)
+            pos = mm.find(pattern)
+            while pos != -1:
+                offsets.append(pos + 1)
+                pos = mm.find(pattern, pos + 1)
+    return np.array(offsets, dtype=np.int64)
+
+def getIndexFile(logFile):
+    return logFile + ".idx.npz"
+
+def buildTagIndex(logFile, tags=DEFAULT_TAGS):
+    """
+        Write a sidecar index with the line offsets of every tag, so later
+        analyses only need to touch the lines of the tags they use.
+    """
+    stat = os.stat(logFile)
+    arrays = {tag.strip("[]"): findTagOffsets(logFile, tag) for tag in tags}
+    saveNpzAtomic(getIndexFile(logFile), _size=stat.st_size, _mtime=stat.st_mtime, **arrays)
+    return arrays
+
+def loadTagOffsets(logFile, tag):
+    """
+        Line offsets of a tag from the sidecar index, or None when there is
+        no index for the current version of the log or it lacks the tag.
+    """
+    indexFile = getIndexFile(logFile)
+    if not os.path.isfile(indexFile):
+        return None
+    stat = os.stat(logFile)
+    with np.load(indexFile) as index:
+        if int(index["_size"]) != stat.st_size or float(index["_mtime"]) != stat.st_mtime:
+            return None
+        if tag.strip("[]") not in index:
+            return None
+        return index[tag.strip("[]")]
+
+def getTagOffsets(logFile, tag):
+    offsets = loadTagOffsets(logFile, tag)
+    if offsets is None:
+        offsets = findTagOffsets(logFile, tag)
+    return offsets
+
+def getTagCount(logFile, tag):
+    offsets = loadTagOffsets(logFile, tag)
+    if offsets is not None:
+        return len(offsets)
+    return countTag(logFile, tag)
+
+def iterRecords(logFile, tag):
+    """
+        Yield the fields (without the tag) of every line that starts with tag.
+        Only the bytes of these lines are read.
+    """
+    offsets = getTagOffsets(logFile, tag)
+    if len(offsets) == 0:
+        return
+    with open(logFile, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in offsets:
+                end = mm.find(b"\n", offset)
+                if end == -1:
+                    end = len(mm)
+                yield mm[offset:end].decode().split()[1:]
+
+def _splitRecords(records, numFields, logFile, tag):
+    """
+        Split records (lines without their tag) into a records x fields
+        array of byte strings, checking that every record has numFields fields.
+    """
+    tokens = b" ".join(records).split()
+    if len(tokens) != numFields * len(records):
+        raise ValueError("Lines with tag {} in {} do not all have {} fields".format(tag, logFile, numFields))
+    return np.array(tokens).reshape(-1, numFields)
+
+def _readIndexedRecords(logFile, offsets, prefixLength):
+    records = []
+    with open(logFile, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for offset in offsets:
+                end = mm.find(b"\n", offset)
+                if end == -1:
+                    end = len(mm)
+                records.append(mm[offset + prefixLength:end])
+    return records
+
+def readTagFields(logFile, tag, chunkSize=CHUNK_SIZE):
+    """
+        Fields (without the tag) of every line that starts with tag, as a
+        lines x fields array of byte strings. All these lines must have the
+        same number of fields. With a sidecar index (see buildTagIndex) only
+        the lines of the tag are read. Otherwise the log is read in chunks,
+        and the lines of the tag are found with one regular expression
+        search per chunk. In both cases the fields are split for all lines
+        at once.
+    """
+    prefix = _linePrefix(tag)
+    offsets = loadTagOffsets(logFile, tag)
+    if offsets is not None:
+        batches = [_readIndexedRecords(logFile, offsets, len(prefix))] if len(offsets) > 0 else []
+    else:
+        batches = []
+        pattern = re.compile(b"^" + re.escape(prefix) + b"(.*)$", re.MULTILINE)
+        with open(logFile, "rb") as f:
+            carry = b""
+            while True:
+                chunk = f.read(chunkSize)
+                data = carry + chunk
+                if chunk:
+                    # The last line of a chunk can continue in the next one
+                    end = data.rfind(b"\n") + 1
+                    data, carry = data[:end], data[end:]
+                records = pattern.findall(data)
+                if records:
+                    batches.append(records)
+                if not chunk:
+                    break
+    if not batches:
+        return np.empty((0, 0), dtype="S1")
+    numFields = len(batches[0][0].split())
+    return np.concatenate([_splitRecords(records, numFields, logFile, tag) for records in batches])
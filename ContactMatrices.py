@@ -0,0 +1,131 @@
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from .ContactLog import readTagFields
+from .Util import mapOverSeeds, MAX_AGE
+
+# Contact logs of runs with survey participants (num_participants_survey > 0)
+# contain a [PART] record per participant,
+#   [PART] <id> <age> <pool ids> <health flags> <health days> <pool sizes>
+# and a [CONT] record for every contact of a participant,
+#   [CONT] <id> <age> <contact age> <6 pool type flags> <day> ...
+# From these, the mean number of contacts per day between a participant of
+# age a and persons of age b is reconstructed for every pool type.
+
+LOG_POOL_TYPES = ["household", "k12school", "college", "workplace", "primary_community", "secondary_community"]
+
+# Pool types of the data/contact_matrix_*.xml files, as sums of the pool types of the log
+MATRIX_POOL_TYPES = {
+    "household": ["household"],
+    "school": ["k12school", "college"],
+    "work": ["workplace"],
+    "primary_community": ["primary_community"],
+    "secondary_community": ["secondary_community"],
+}
+
+def toAges(fields):
+    ages = fields.astype(float).astype(np.int64)
+    return np.clip(ages, 0, MAX_AGE)
+
+def readSurvey(logFile):
+    """
+        Ids and ages of the participants, and participant id, participant
+        age, contact age, pool type (index in LOG_POOL_TYPES) and day of
+        each of their contacts.
+    """
+    participants = readTagFields(logFile, "[PART]")
+    contacts = readTagFields(logFile, "[CONT]")
+    if len(participants) == 0:
+        participants = np.empty((0, 2), dtype="S1")
+    if len(contacts) == 0:
+        contacts = np.empty((0, 10), dtype="S1")
+    ids = participants[:, 0].astype(np.int64)
+    contactIds = contacts[:, 0].astype(np.int64)
+    # Keep only the contacts of participants
+    fromParticipant = np.isin(contactIds, ids)
+    contacts = contacts[fromParticipant]
+    poolTypes = np.argmax(contacts[:, 3:9].astype(np.int64), axis=1)
+    return (ids, toAges(participants[:, 1]), contactIds[fromParticipant], toAges(contacts[:, 1]),
+            toAges(contacts[:, 2]), poolTypes, contacts[:, 9].astype(np.int64))
+
+def countContacts(participantAges, contactAges, poolTypes):
+    """
+        Number of contacts per pool type, participant age and contact age,
+        as a pool types x ages x ages array.
+    """
+    numAges = MAX_AGE + 1
+    keys = (poolTypes * numAges + participantAges) * numAges + contactAges
+    counts = np.bincount(keys, minlength=len(LOG_POOL_TYPES) * numAges * numAges)
+    return counts.reshape(len(LOG_POOL_TYPES), numAges, numAges)
+
+def getSurveyCounts(outputDir, scenarioName, seed):
+    """
+        Contact counts (see countContacts) of the survey of a run and the
+        number of participant-days per age they were counted over.
+    """
+    logFile = os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt")
+    ids, ages, contactIds, participantAges, contactAges, poolTypes, days = readSurvey(logFile)
+    numDays = len(np.unique(days)) if len(days) > 0 else 1
+    participantDays = np.bincount(ages, minlength=MAX_AGE + 1) * numDays
+    return countContacts(participantAges, contactAges, poolTypes), participantDays
+
+def toContactRates(counts, participantDays):
+    """
+        Mean number of contacts per participant-day for every pool type of
+        MATRIX_POOL_TYPES, as a dictionary of ages x ages arrays.
+        Rows of ages without participants are 0.
+    """
+    matrices = {}
+    denominator = participantDays[:, np.newaxis]
+    for poolType, logPoolTypes in MATRIX_POOL_TYPES.items():
+        poolCounts = sum(counts[LOG_POOL_TYPES.index(t)] for t in logPoolTypes)
+        rates = np.zeros(poolCounts.shape)
+        np.divide(poolCounts, denominator, out=rates, where=(denominator > 0))
+        matrices[poolType] = rates
+    return matrices
+
+def getScenarioContactMatrices(outputDir, scenarioName, poolSize):
+    """
+        Contact matrices of a scenario, from the surveys of all its seeds.
+    """
+    results = mapOverSeeds(getSurveyCounts, outputDir, [scenarioName], poolSize)[0]
+    counts = sum(r[0] for r in results)
+    participantDays = sum(r[1] for r in results)
+    return toContactRates(counts, participantDays)
+
+def readContactMatrices(matrixFile):
+    """
+        Contact rates of a data/contact_matrix_*.xml file for every pool type
+        of MATRIX_POOL_TYPES, as ages x ages arrays (ages 0 to MAX_AGE).
+    """
+    root = ET.parse(matrixFile).getroot()
+    matrices = {}
+    for poolType in MATRIX_POOL_TYPES:
+        pool = root.find(poolType)
+        if pool is None:
+            continue
+        rates = np.zeros((MAX_AGE + 1, MAX_AGE + 1))
+        for participant in pool.findall("participant"):
+            age = int(participant.find("age").text)
+            for contact in participant.find("contacts").findall("contact"):
+                rates[age, int(contact.find("age").text)] = float(contact.find("rate").text)
+        matrices[poolType] = rates
+    return matrices
+
+def compareContactMatrices(matrices, referenceMatrices, participantDays=None):
+    """
+        Mean absolute difference between two sets of contact matrices per
+        pool type, over the participant ages with participants when
+        participantDays is given.
+    """
+    differences = {}
+    for poolType in matrices:
+        if poolType not in referenceMatrices:
+            continue
+        difference = np.abs(matrices[poolType] - referenceMatrices[poolType])
+        if participantDays is not None:
+            difference = difference[participantDays > 0]
+        differences[poolType] = float(difference.mean()) if difference.size > 0 else 0.0
+    return differences
@@ -1,29 +1,22 @@
 import matplotlib.pyplot as plt
-import multiprocessing
+import numpy as np
 import os
 import statistics
 
 from mpl_toolkits.mplot3d import Axes3D
 
-from .Util import getRngSeeds, saveFig
+from .ContactLog import getTagCount
+from .ResultCache import cachedPerSeed
+from .TransmissionTree import getEffectiveRByDay, getEffectiveRByGeneration
+from .Util import mapOverSeeds, saveFig
 
+@cachedPerSeed("{run}_contact_log.txt")
 def getEffectiveR(outputDir, scenarioName, seed):
     transmissionsFile = os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt")
-    totalInfected = 0
-    with open(transmissionsFile) as f:
-        for line in f:
-            line = line.split(' ')
-            if line[0] == "[TRAN]":
-                totalInfected += 1
-    return totalInfected
+    return getTagCount(transmissionsFile, "[TRAN]")
 
 def createEffectiveRPlot(outputDir, scenarioNames, scenarioDisplayNames, poolSize, xLabel, figName):
-    allEffectiveRs = []
-    for scenario in scenarioNames:
-        seeds = getRngSeeds(outputDir, scenario)
-        with multiprocessing.Pool(processes=poolSize) as pool:
-            effectiveRs = pool.starmap(getEffectiveR, [(outputDir, scenario, s) for s in seeds])
-            allEffectiveRs.append(effectiveRs)
+    allEffectiveRs = mapOverSeeds(getEffectiveR, outputDir, scenarioNames, poolSize)
     plt.boxplot(allEffectiveRs, labels=scenarioDisplayNames)
     plt.xlabel(xLabel)
     plt.ylabel("Effective R")
@@ -32,19 +25,19 @@ def createEffectiveRPlot(outputDir, scenarioNames, scenarioDisplayNames, poolSiz
 def createEffectiveROverviewPlot(outputDir, scenarioNames, scenarioDisplayNames, R0s, poolSize, figName, stat="mean"):
     ax = plt.axes(projection="3d")
     z = 0
-    for R0 in R0s:
+    # Read all scenarios of the grid as one task queue
+    gridScenarioNames = [str(scenario) + "_R0_" + str(R0) for R0 in R0s for scenario in scenarioNames]
+    gridEffectiveRs = mapOverSeeds(getEffectiveR, outputDir, gridScenarioNames, poolSize)
+    for R0_i in range(len(R0s)):
         results = []
-        for scenario in scenarioNames:
-            scenarioName = str(scenario) + "_R0_" + str(R0)
-            seeds = getRngSeeds(outputDir, scenarioName)
-            with multiprocessing.Pool(processes=poolSize) as pool:
-                effectiveRs = pool.starmap(getEffectiveR, [(outputDir, scenarioName, s) for s in seeds])
-                if stat == "mean":
-                    results.append(sum(effectiveRs) / len(effectiveRs))
-                elif stat == "median":
-                    results.append(statistics.median(effectiveRs))
-                else:
-                    print("No valid statistic supplied!")
+        for s_i in range(len(scenarioNames)):
+            effectiveRs = gridEffectiveRs[R0_i * len(scenarioNames) + s_i]
+            if stat == "mean":
+                results.append(sum(effectiveRs) / len(effectiveRs))
+            elif stat == "median":
+                results.append(statistics.median(effectiveRs))
+            else:
+                print("No valid statistic supplied!")
         ax.bar(range(len(results)), results, zs=z, zdir="y", alpha=0.8)
         z += 1
     ax.set_xlabel("Calendar year")
@@ -55,3 +48,32 @@ def createEffectiveROverviewPlot(outputDir, scenarioNames, scenarioDisplayNames,
     ax.set_yticklabels(R0s)
     ax.set_zlabel("Effective R")
     saveFig(outputDir, figName)
+
+def averageCurves(curves):
+    """
+        Mean over runs of curves that can differ in length.
+    """
+    length = max([len(c) for c in curves] + [0])
+    padded = np.full((len(curves), length), np.nan)
+    for c_i in range(len(curves)):
+        padded[c_i, :len(curves[c_i])] = curves[c_i]
+    return np.nanmean(padded, axis=0)
+
+def createEffectiveRCurvesPlot(outputDir, scenarioNames, scenarioDisplayNames, poolSize, figName, numDays=None):
+    """
+        Plot the mean effective R per day of infection (R_t) when numDays
+        is given, otherwise per generation of the transmission tree.
+    """
+    if numDays is not None:
+        allCurves = mapOverSeeds(getEffectiveRByDay, outputDir, scenarioNames, poolSize, (numDays,))
+        xLabel = "Day"
+    else:
+        allCurves = mapOverSeeds(getEffectiveRByGeneration, outputDir, scenarioNames, poolSize)
+        xLabel = "Generation"
+    for curves in allCurves:
+        plt.plot(averageCurves(curves))
+    plt.axhline(1, color="grey", linestyle=":")
+    plt.xlabel(xLabel)
+    plt.ylabel("Effective R")
+    plt.legend(scenarioDisplayNames)
+    saveFig(outputDir, figName)
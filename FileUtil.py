@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+# Helpers for reading output files and for the cache and index files that are
+# written next to the files they are computed from. This module has no
+# package-relative imports, so it can also be imported by the simulation
+# scripts and the modules they use.
+
+def getFileState(fileName):
+    """
+        Size and modification time (ns) of a file,
+        or None when it does not exist.
+    """
+    try:
+        stat = os.stat(fileName)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def saveNpzAtomic(fileName, **arrays):
+    """
+        np.savez the arrays to a temporary file that then replaces fileName,
+        so other processes never load a partially written file.
+    """
+    tmpFile = "{}.{}.tmp".format(fileName, os.getpid())
+    with open(tmpFile, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmpFile, fileName)
+
+def readLastLines(fileName, numLines, blockSize=8192):
+    """
+        Read the last numLines lines of a file by seeking back from its end.
+    """
+    with open(fileName, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # One extra newline is needed to be sure the first line is complete
+        while position > 0 and data.rstrip(b"\n").count(b"\n") < numLines:
+            step = min(blockSize, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.rstrip(b"\n").split(b"\n")
+    return [line.decode().rstrip("\r") for line in lines[-numLines:]]
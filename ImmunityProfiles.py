@@ -0,0 +1,100 @@
+import glob
+import os
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+try:
+    from .FileUtil import getFileState, saveNpzAtomic
+except ImportError:
+    # Imported as a top-level module by a simulation script
+    from FileUtil import getFileState, saveNpzAtomic
+
+# Age-dependent immunity profiles such as data/2020_measles_immunity.xml
+# contain the fraction of immune persons for every age in <age0>..<age99>
+# elements. All profiles of a data directory are parsed once into a dense
+# profiles x ages array, which is cached in a binary file next to them
+# together with the size and modification time of every profile file.
+# Its only package import falls back to a top-level import, so the profiles
+# can also be used from the simulation scripts.
+
+MAX_AGE = 99
+
+PROFILE_PATTERN = "*_measles*_immunity.xml"
+
+CACHE_FILE_NAME = "immunity_profiles.npz"
+
+# Loaded profiles per process, keyed by data directory
+_profiles = {}
+
+def parseImmunityProfile(profileFile):
+    """
+        Immunity rate for every age (0 to MAX_AGE) in a profile file.
+        Raises ValueError when an age is missing or duplicated, or a
+        rate is not between 0 and 1.
+    """
+    root = ET.parse(profileFile).getroot()
+    rates = np.full(MAX_AGE + 1, np.nan)
+    for element in root:
+        if not element.tag.startswith("age"):
+            continue
+        age = int(element.tag[3:])
+        if age < 0 or age > MAX_AGE or not np.isnan(rates[age]):
+            raise ValueError("{}: unexpected or duplicate element {}".format(profileFile, element.tag))
+        rates[age] = float(element.text)
+    if np.isnan(rates).any():
+        missing = np.flatnonzero(np.isnan(rates))
+        raise ValueError("{}: no immunity rate for ages {}".format(profileFile, missing.tolist()))
+    if (rates < 0).any() or (rates > 1).any():
+        raise ValueError("{}: immunity rates must be between 0 and 1".format(profileFile))
+    return rates
+
+def compileImmunityProfiles(dataDir):
+    """
+        Parse all immunity profiles of a data directory and write them
+        to its cache file.
+    """
+    profileFiles = sorted(glob.glob(os.path.join(dataDir, PROFILE_PATTERN)))
+    names = [os.path.basename(f) for f in profileFiles]
+    rates = np.array([parseImmunityProfile(f) for f in profileFiles]).reshape(-1, MAX_AGE + 1)
+    states = np.array([getFileState(f) for f in profileFiles], dtype=np.int64).reshape(-1, 2)
+    saveNpzAtomic(os.path.join(dataDir, CACHE_FILE_NAME), names=np.array(names), rates=rates, states=states)
+    return {name: (tuple(state), r) for name, state, r in zip(names, states.tolist(), rates)}
+
+def loadImmunityProfiles(dataDir):
+    cacheFile = os.path.join(dataDir, CACHE_FILE_NAME)
+    if not os.path.isfile(cacheFile):
+        return {}
+    with np.load(cacheFile) as f:
+        return {str(name): (tuple(state), r)
+                for name, state, r in zip(f["names"], f["states"].tolist(), f["rates"])}
+
+def getImmunityRates(dataDir, profileFile):
+    """
+        Immunity rate for every age (0 to MAX_AGE) of a profile in dataDir,
+        e.g. getImmunityRates("data", "2020_measles_immunity.xml").
+        The profiles are recompiled when the profile was added or changed.
+    """
+    key = os.path.abspath(dataDir)
+    state = getFileState(os.path.join(dataDir, profileFile))
+    if key not in _profiles:
+        _profiles[key] = loadImmunityProfiles(dataDir)
+    profiles = _profiles[key]
+    if profileFile not in profiles or profiles[profileFile][0] != state:
+        profiles = compileImmunityProfiles(dataDir)
+        _profiles[key] = profiles
+        if profileFile not in profiles:
+            # Profiles that do not match PROFILE_PATTERN are not cached
+            return parseImmunityProfile(os.path.join(dataDir, profileFile))
+    return profiles[profileFile][1].copy()
+
+def getSusceptibilityRates(dataDir, profileFile):
+    return 1 - getImmunityRates(dataDir, profileFile)
+
+def getImmunityProfileParameters(dataDir, profileFile):
+    """
+        Run configuration parameters for an age-dependent immunity profile,
+        after checking that the profile is valid (see getImmunityRates).
+    """
+    getImmunityRates(dataDir, profileFile)
+    return {"immunity_profile": "AgeDependent", "immunity_distribution_file": profileFile}
@@ -1,46 +1,43 @@
-import csv
-import math
 import matplotlib.pyplot as plt
-import multiprocessing
-import os
 
 from mpl_toolkits import mplot3d
 
-from .Util import getFinalOutbreakSize, getRngSeeds, saveFig
+from .ScenarioSummary import getScenarioSummaries
+from .Util import getFinalOutbreakSize, getSusceptiblesAtStart, saveFig
 
-def calculateSE(fractionSuccesses, sampleSize, confidenceLevel=95):
-    zValues = {90: 1.645, 95: 1.96, 99: 2.576}
-    # There should be at least 5 successes and 5 failures for this formula
-    # to be appropriate
-    numSuccesses = fractionSuccesses * sampleSize
-    numFailures = sampleSize - numSuccesses
-    if numSuccesses >= 5 and numFailures >= 5:
-        z = zValues[confidenceLevel]
-        se = z * math.sqrt((fractionSuccesses * (1 - fractionSuccesses)) / sampleSize)
-        return se
-    else:
-        print("Confidence interval could not be calculated: sample too small")
+def getOutbreakErrors(summaries, extinctionThreshold, confidenceLevel=95):
+    """
+        Fractions of outbreaks of the given scenario summaries, with the
+        distances to the bounds of their (Wilson) confidence intervals
+        as expected by plt.errorbar.
+    """
+    fractionOutbreaks = []
+    lowerErrors = []
+    upperErrors = []
+    for summary in summaries:
+        frac = summary.getFractionOutbreaks(extinctionThreshold)
+        lower, upper = summary.getOutbreakInterval(extinctionThreshold, confidenceLevel)
+        fractionOutbreaks.append(frac)
+        lowerErrors.append(max(0, frac - lower))
+        upperErrors.append(max(0, upper - frac))
+    return fractionOutbreaks, [lowerErrors, upperErrors]
+
+def getGridScenarioNames(R0s, scenarioNames):
+    return [str(scn) + "_R0_" + str(R0) for R0 in R0s for scn in scenarioNames]
+
+def getGridSummaries(outputDir, R0s, scenarioNames, numDays, poolSize, withSusceptibles=False):
+    """
+        Summaries of all scenarios of the grid, read as one task
+        queue, keyed by scenario name.
+    """
+    gridNames = getGridScenarioNames(R0s, scenarioNames)
+    return dict(zip(gridNames, getScenarioSummaries(outputDir, gridNames, numDays, poolSize, withSusceptibles)))
 
 def createOutbreakOccurrencePlot(outputDir, scenarioNames, scenarioDisplayNames, numDays, extinctionThreshold, poolSize, figName):
-    fractionOutbreaks = []
-    numRuns = 0
-    for scenario in scenarioNames:
-        seeds = getRngSeeds(outputDir, scenario)
-        numRuns = len(seeds)
-        with multiprocessing.Pool(processes=poolSize) as pool:
-            finalSizes = pool.starmap(getFinalOutbreakSize, [(outputDir, scenario, s, numDays) for s in seeds])
-            outbreaks = [1 if x>= extinctionThreshold else 0 for x in finalSizes]
-            fractionOutbreaks.append(sum(outbreaks) / len(outbreaks))
-    if numRuns > 0:
-        SEs = []
-        # Calculate confidence intervals
-        for frac in fractionOutbreaks:
-            se = calculateSE(frac, numRuns)
-            if se is not None:
-                SEs.append(se)
-            else:
-                SEs.append(0)
-        plt.errorbar(range(len(fractionOutbreaks)), fractionOutbreaks, SEs, fmt="o", ecolor="red", capsize=4)
+    summaries = getScenarioSummaries(outputDir, scenarioNames, numDays, poolSize)
+    if all(len(summary.seeds) > 0 for summary in summaries):
+        fractionOutbreaks, errors = getOutbreakErrors(summaries, extinctionThreshold)
+        plt.errorbar(range(len(fractionOutbreaks)), fractionOutbreaks, errors, fmt="o", ecolor="red", capsize=4)
 
         plt.ylabel("Fraction outbreaks")
         plt.ylim(0, 1)
@@ -50,28 +47,13 @@ def createOutbreakOccurrencePlot(outputDir, scenarioNames, scenarioDisplayNames,
 # TODO make this a 3D plot too?
 def createOutbreakOccurrenceOverviewPlot(outputDir, R0s, scenarioNames, scenarioDisplayNames, numDays, extinctionThreshold, poolSize):
     fmts = ['o', 'v', '+', 'D', '.', '*', 'x']
+    gridSummaries = getGridSummaries(outputDir, R0s, scenarioNames, numDays, poolSize)
     for R0_i in range(len(R0s)):
         R0 = R0s[R0_i]
-        fractionOutbreaks = []
-        numRuns = 0
-        for scn in scenarioNames:
-            scenarioName = str(scn) + "_R0_" + str(R0)
-            seeds = getRngSeeds(outputDir, scenarioName)
-            numRuns = len(seeds)
-            with multiprocessing.Pool(processes=poolSize) as pool:
-                finalSizes = pool.starmap(getFinalOutbreakSize, [(outputDir, scenarioName, s, numDays) for s in seeds])
-                outbreaks = [1 if x>= extinctionThreshold else 0 for x in finalSizes]
-                fractionOutbreaks.append(sum(outbreaks) / len(outbreaks))
-        if numRuns > 0:
-            SEs = []
-            # Calculate confidence intervals
-            for frac in fractionOutbreaks:
-                se = calculateSE(frac, numRuns)
-                if se is not None:
-                    SEs.append(se)
-                else:
-                    SEs.append(0)
-            plt.errorbar(range(len(scenarioNames)), fractionOutbreaks, SEs, fmt=fmts[R0_i], markersize=7, capsize=5)
+        summaries = [gridSummaries[str(scn) + "_R0_" + str(R0)] for scn in scenarioNames]
+        if all(len(summary.seeds) > 0 for summary in summaries):
+            fractionOutbreaks, errors = getOutbreakErrors(summaries, extinctionThreshold)
+            plt.errorbar(range(len(scenarioNames)), fractionOutbreaks, errors, fmt=fmts[R0_i], markersize=7, capsize=5)
             #TODO ecolor?
     plt.xticks(range(len(scenarioNames)), scenarioDisplayNames)
     plt.xlabel("Calendar year")
@@ -82,16 +64,13 @@ def createOutbreakOccurrenceOverviewPlot(outputDir, R0s, scenarioNames, scenario
 
 def createFinalSizesSideBySidePlot(outputDir, R0s, years, numDays, extinctionThreshold, poolSize):
     subplotCoors = [(1, 2, 1), (1, 2, 2)]
+    gridSummaries = getGridSummaries(outputDir, R0s, years, numDays, poolSize)
     for R0_i in range(len(R0s)):
         R0 = R0s[R0_i]
         allFinalSizes = []
         for year in years:
-            scenarioName = str(year) + "_R0_" + str(R0)
-            seeds = getRngSeeds(outputDir, scenarioName)
-            with multiprocessing.Pool(processes=poolSize) as pool:
-                finalSizes = pool.starmap(getFinalOutbreakSize, [(outputDir, scenarioName, s, numDays) for s in seeds])
-                finalSizes = [x for x in finalSizes if x >= extinctionThreshold]
-                allFinalSizes.append(finalSizes)
+            summary = gridSummaries[str(year) + "_R0_" + str(R0)]
+            allFinalSizes.append(summary.getOutbreakSizes(extinctionThreshold))
         plt.subplot(subplotCoors[R0_i][0], subplotCoors[R0_i][1], subplotCoors[R0_i][2])
         plt.boxplot(allFinalSizes, labels=years)
         plt.xlabel("Calendar year")
@@ -113,12 +92,8 @@ def createFinalSizesSideBySidePlot(outputDir, R0s, years, numDays, extinctionThr
 
 def createFinalSizesBoxplot(outputDir, scenarioNames, scenarioDisplayNames, numDays, extinctionThreshold, poolSize, figName):
     allFinalSizes = []
-    for scenario in scenarioNames:
-        seeds = getRngSeeds(outputDir, scenario)
-        with multiprocessing.Pool(processes=poolSize) as pool:
-            finalSizes = pool.starmap(getFinalOutbreakSize, [(outputDir, scenario, s, numDays) for s in seeds])
-            finalSizes = [x for x in finalSizes if x >= extinctionThreshold]
-            allFinalSizes.append(finalSizes)
+    for summary in getScenarioSummaries(outputDir, scenarioNames, numDays, poolSize):
+        allFinalSizes.append(summary.getOutbreakSizes(extinctionThreshold))
     plt.boxplot(allFinalSizes, labels=scenarioDisplayNames)
     plt.ylabel("Final outbreak size after {} days".format(numDays))
     #plt.ylim(0, 10000)
@@ -131,24 +106,22 @@ def createFinalSizesOverviewPlots(outputDir, R0s, scenarioNames, scenarioDisplay
     ys_scat = []
     zs_surf = [] # z-axis = mean final size when no extinction occurs
     zs_scat = []
+    gridSummaries = getGridSummaries(outputDir, R0s, scenarioNames, numDays, poolSize)
     for R0 in R0s:
         for s_i in range(len(scenarioNames)):
             scenarioName = str(scenarioNames[s_i]) + "_R0_" + str(R0)
             xs_surf.append(s_i)
             ys_surf.append(R0)
-            seeds = getRngSeeds(outputDir, scenarioName)
-            with multiprocessing.Pool(processes=poolSize) as pool:
-                finalSizes = pool.starmap(getFinalOutbreakSize,
-                                            [(outputDir, scenarioName, s, numDays) for s in seeds])
-                finalSizes = [f for f in finalSizes if f >= extinctionThreshold]
-                for f in finalSizes:
-                    xs_scat.append(s_i)
-                    ys_scat.append(R0)
-                    zs_scat.append(f)
-                if len(finalSizes) > 0:
-                    zs_surf.append(sum(finalSizes) / len(finalSizes))
-                else:
-                    zs_surf.append(0)
+            summary = gridSummaries[scenarioName]
+            finalSizes = summary.getOutbreakSizes(extinctionThreshold)
+            for f in finalSizes:
+                xs_scat.append(s_i)
+                ys_scat.append(R0)
+                zs_scat.append(f)
+            if len(finalSizes) > 0:
+                zs_surf.append(sum(finalSizes) / len(finalSizes))
+            else:
+                zs_surf.append(0)
     # Create 3D surface plot
     ax = plt.axes(projection="3d")
     ax.plot_trisurf(xs_surf, ys_surf, zs_surf)
@@ -164,16 +137,6 @@ def createFinalSizesOverviewPlots(outputDir, R0s, scenarioNames, scenarioDisplay
     ax.set_yticks(R0s)
     saveFig(outputDir, "AllOutbreakSizesScatter")
 
-def getSusceptiblesAtStart(outputDir, scenarioName, seed):
-    totalSusceptible = 0
-    susceptiblesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "susceptibles.csv")
-    with open(susceptiblesFile) as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if int(row["susceptible"]):
-                totalSusceptible += 1
-    return totalSusceptible
-
 def getEscapeProbability(outputDir, scenarioName, seed, numDays, extinctionThreshold):
     totalInfected = getFinalOutbreakSize(outputDir, scenarioName, seed, numDays)
     if totalInfected >= extinctionThreshold:
@@ -188,12 +151,8 @@ def getEscapeProbability(outputDir, scenarioName, seed, numDays, extinctionThres
 def createEscapeProbabilityPlot(outputDir, scenarioNames, scenarioDisplayNames,
     numDays, extinctionThreshold, poolSize, figName):
     allEscapeProbabilities = []
-    for scenario in scenarioNames:
-        seeds = getRngSeeds(outputDir, scenario)
-        with multiprocessing.Pool(processes=poolSize) as pool:
-            escapeProbabilities = pool.starmap(getEscapeProbability,
-                                        [(outputDir, scenario, s, numDays, extinctionThreshold) for s in seeds])
-            allEscapeProbabilities.append([x for x in escapeProbabilities if x is not None])
+    for summary in getScenarioSummaries(outputDir, scenarioNames, numDays, poolSize, withSusceptibles=True):
+        allEscapeProbabilities.append(summary.getEscapeProbabilities(extinctionThreshold))
     plt.boxplot(allEscapeProbabilities, labels=scenarioDisplayNames)
     plt.ylabel("Escape probability")
     plt.ylim(0, 1.05)
@@ -207,27 +166,23 @@ def createEscapeProbabilityOverviewPlots(outputDir, R0s, scenarioNames, scenario
     ys_scat = []
     zs_surf = [] # z-axis = escape probability
     zs_scat = []
+    gridSummaries = getGridSummaries(outputDir, R0s, scenarioNames, numDays, poolSize, withSusceptibles=True)
     for R0 in R0s:
         for s_i in range(len(scenarioNames)):
             scenarioName = scenarioNames[s_i] + "_R0_" + str(R0)
             xs_surf.append(s_i)
             ys_surf.append(R0)
-            seeds = getRngSeeds(outputDir, scenarioName)
-            with multiprocessing.Pool(processes=poolSize) as pool:
-                escapeProbabilities = pool.starmap(getEscapeProbability,
-                                                    [(outputDir, scenarioName, s,
-                                                    numDays, extinctionThreshold)
-                                                    for s in seeds])
-                escapeProbabilities = [e for e in escapeProbabilities if e is not None]
-                for e in escapeProbabilities:
-                    xs_scat.append(s_i)
-                    ys_scat.append(R0)
-                    zs_scat.append(e)
-                if len(escapeProbabilities) > 0:
-                    zs_surf.append(sum(escapeProbabilities) / len(escapeProbabilities))
-                else:
-                    xs_surf.pop()
-                    ys_surf.pop()
+            summary = gridSummaries[scenarioName]
+            escapeProbabilities = summary.getEscapeProbabilities(extinctionThreshold)
+            for e in escapeProbabilities:
+                xs_scat.append(s_i)
+                ys_scat.append(R0)
+                zs_scat.append(e)
+            if len(escapeProbabilities) > 0:
+                zs_surf.append(sum(escapeProbabilities) / len(escapeProbabilities))
+            else:
+                xs_surf.pop()
+                ys_surf.pop()
     # Create 3D surface plot
     ax = plt.axes(projection="3d")
     ax.plot_trisurf(xs_surf, ys_surf, zs_surf)
@@ -0,0 +1,199 @@
+import atexit
+import functools
+import hashlib
+import json
+import multiprocessing.util
+import os
+import sqlite3
+import sys
+import time
+
+from .FileUtil import getFileState
+
+# Persistent cache for per-seed analysis results. Every output directory gets
+# one SQLite file with the results of the functions decorated with
+# cachedPerSeed, keyed by the function (name and the source of its module and
+# of the package modules that module imports from), its arguments and the
+# path, size and modification time of the files the result was computed from.
+# Rerunning an analysis thus only reads the files of new or changed seeds.
+# When the cache grows beyond maxBytes, the least recently used results are
+# dropped.
+
+CACHE_FILE_NAME = "analysis_cache.sqlite"
+
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+# Number of results that are added between two checks of the cache size
+PRUNE_INTERVAL = 1000
+
+# Number of cache hits after which their access times are written
+ACCESS_BATCH_SIZE = 1000
+
+_settings = {"enabled": True, "maxBytes": MAX_CACHE_BYTES}
+
+# Open caches of this process, keyed by (process id, cache file),
+# connections can not be shared with forked pool workers
+_caches = {}
+
+class ResultCache:
+    def __init__(self, cacheFile, maxBytes=MAX_CACHE_BYTES):
+        self.cacheFile = cacheFile
+        self.maxBytes = maxBytes
+        self.numAdded = 0
+        # Access times of cache hits that were not written yet, keyed by key
+        self.accessed = {}
+        self.connection = sqlite3.connect(cacheFile, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS results "
+                                    "(key TEXT PRIMARY KEY, value TEXT, size INTEGER, accessed REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def get(self, key):
+        """
+            (True, value) for a cached result, (False, None) otherwise.
+        """
+        row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return False, None
+        self.accessed[key] = time.time()
+        if len(self.accessed) >= ACCESS_BATCH_SIZE:
+            self.writeAccessed()
+        return True, json.loads(row[0])
+
+    def writeAccessed(self):
+        if len(self.accessed) == 0:
+            return
+        with self.connection:
+            self.connection.executemany("UPDATE results SET accessed = ? WHERE key = ?",
+                                        [(t, key) for key, t in self.accessed.items()])
+        self.accessed = {}
+
+    def put(self, key, value):
+        # NumPy scalars and arrays are stored as their Python equivalents
+        encoded = json.dumps(value, default=lambda o: o.tolist())
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                    (key, encoded, len(key) + len(encoded), time.time()))
+        self.numAdded += 1
+        if self.numAdded % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def getSize(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def prune(self):
+        """
+            Drop the least recently used results until the cache
+            holds at most maxBytes.
+        """
+        self.writeAccessed()
+        excess = self.getSize() - self.maxBytes
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY accessed"):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        with self.connection:
+            self.connection.executemany("DELETE FROM results WHERE key = ?", keys)
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM results")
+
+    def close(self):
+        if self.connection is None:
+            return
+        self.prune()
+        self.connection.close()
+        self.connection = None
+
+def getCache(outputDir):
+    cacheFile = os.path.join(os.path.abspath(outputDir), CACHE_FILE_NAME)
+    key = (os.getpid(), cacheFile)
+    if key not in _caches:
+        cache = ResultCache(cacheFile, _settings["maxBytes"])
+        _caches[key] = cache
+        # atexit handlers do not run in pool workers, finalizers do
+        multiprocessing.util.Finalize(cache, cache.close, exitpriority=10)
+    return _caches[key]
+
+def closeCaches():
+    for key in list(_caches):
+        if key[0] == os.getpid():
+            _caches.pop(key).close()
+
+atexit.register(closeCaches)
+
+def setCacheOptions(enabled=True, maxBytes=MAX_CACHE_BYTES):
+    """
+        Enable or disable the cache and set its size limit. Pool workers
+        started before this call keep the previous options.
+    """
+    _settings["enabled"] = enabled
+    _settings["maxBytes"] = maxBytes
+    for cache in _caches.values():
+        cache.maxBytes = maxBytes
+
+def getFileKey(fileName):
+    """
+        Absolute path, size and modification time of a file,
+        or only its path if it does not exist.
+    """
+    path = os.path.abspath(fileName)
+    return [path] + list(getFileState(path) or [])
+
+def getSourceHash(func):
+    """
+        Hash of the source files of the module of func and of the modules
+        of this package that it imports functions, classes or modules from.
+    """
+    packageDir = os.path.dirname(os.path.abspath(__file__))
+    module = sys.modules[func.__module__]
+    files = {os.path.abspath(module.__file__)}
+    for value in vars(module).values():
+        valueModule = value if type(value) is type(module) else sys.modules.get(getattr(value, "__module__", None))
+        fileName = getattr(valueModule, "__file__", None)
+        if fileName is not None and os.path.dirname(os.path.abspath(fileName)) == packageDir:
+            files.add(os.path.abspath(fileName))
+    sourceHash = hashlib.sha1()
+    for fileName in sorted(files):
+        with open(fileName, "rb") as f:
+            sourceHash.update(f.read())
+    return sourceHash.hexdigest()
+
+def cachedPerSeed(*fileTemplates):
+    """
+        Decorator for a function f(outputDir, scenarioName, seed, *args) that
+        caches its results in the ResultCache of outputDir. fileTemplates are
+        the files the result is computed from, relative to outputDir, in which
+        {scenario} and {run} (<scenarioName>_<seed>) are filled in.
+        Arguments and results must be JSON serializable.
+    """
+    def decorator(func):
+        # The source hash is computed on the first call, when all imports of the module are done
+        functionKey = []
+
+        @functools.wraps(func)
+        def wrapper(outputDir, scenarioName, seed, *args):
+            if not _settings["enabled"]:
+                return func(outputDir, scenarioName, seed, *args)
+            if len(functionKey) == 0:
+                functionKey.extend([func.__qualname__, getSourceHash(func)])
+            run = scenarioName + "_" + str(seed)
+            files = [getFileKey(os.path.join(outputDir, t.format(scenario=scenarioName, run=run)))
+                     for t in fileTemplates]
+            keyData = json.dumps([functionKey, [scenarioName, seed] + list(args), files])
+            key = hashlib.sha1(keyData.encode()).hexdigest()
+            cache = getCache(outputDir)
+            found, result = cache.get(key)
+            if not found:
+                result = func(outputDir, scenarioName, seed, *args)
+                cache.put(key, result)
+            return result
+        return wrapper
+    return decorator
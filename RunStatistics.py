@@ -0,0 +1,124 @@
+import matplotlib.colors
+import matplotlib.pyplot as plt
+import numpy as np
+
+# Statistics over the runs of a scenario for per-age (or per-day) results.
+# The results of all runs are stacked into one runs x columns array, and all
+# statistics are computed per column on that array.
+
+STATS = ["mean", "median"]
+
+# Maximum number of values in one batch of bootstrap resamples
+BOOTSTRAP_BATCH_SIZE = 1 << 24
+
+# Weight of the line color in the fill color of a band, the rest is white.
+# Figures are saved as EPS, which has no transparency.
+BAND_COLOR_WEIGHT = 0.2
+
+def stackRuns(runs, numColumns):
+    """
+        Turn a list with one list of values per run into a runs x numColumns array.
+    """
+    return np.array(runs, dtype=float).reshape(-1, numColumns)
+
+def _getStat(values, stat, axis):
+    if stat == "mean":
+        return values.mean(axis=axis)
+    elif stat == "median":
+        return np.median(values, axis=axis)
+    raise ValueError("No valid statistic supplied: {}".format(stat))
+
+def bootstrapInterval(values, stat="mean", numResamples=1000, confidenceLevel=95, rngSeed=None):
+    """
+        Percentile bootstrap confidence interval (lower, upper) of the
+        statistic of every column, resampling runs with replacement.
+    """
+    numRuns, numColumns = values.shape
+    rng = np.random.RandomState(rngSeed)
+    if stat == "mean":
+        # The mean of a resample only depends on how often every run is drawn
+        counts = rng.multinomial(numRuns, np.full(numRuns, 1 / numRuns), size=numResamples)
+        resampled = counts @ values / numRuns
+    else:
+        batchSize = max(1, BOOTSTRAP_BATCH_SIZE // max(1, numRuns * numColumns))
+        resampled = np.empty((numResamples, numColumns))
+        for start in range(0, numResamples, batchSize):
+            end = min(start + batchSize, numResamples)
+            indices = rng.randint(0, numRuns, size=(end - start, numRuns))
+            resampled[start:end] = _getStat(values[indices], stat, axis=1)
+    alpha = (100 - confidenceLevel) / 2
+    return np.percentile(resampled, alpha, axis=0), np.percentile(resampled, 100 - alpha, axis=0)
+
+def getColumnStats(values, quantiles=(0.05, 0.95), bootstrapStat=None, numResamples=1000,
+                   confidenceLevel=95, rngSeed=None):
+    """
+        Statistics of every column of a runs x columns array, as a dictionary of
+        arrays: "mean", "median", the lower and upper quantiles of the runs
+        ("qLower", "qUpper") and, when bootstrapStat is "mean" or "median", the
+        bootstrap confidence interval of that statistic ("ciLower", "ciUpper").
+        All statistics are 0 when there are no runs.
+    """
+    numColumns = values.shape[1]
+    stats = {}
+    if len(values) == 0:
+        for name in ["mean", "median", "qLower", "qUpper", "ciLower", "ciUpper"]:
+            stats[name] = np.zeros(numColumns)
+        return stats
+    stats["mean"] = values.mean(axis=0)
+    stats["median"] = np.median(values, axis=0)
+    stats["qLower"], stats["qUpper"] = np.quantile(values, quantiles, axis=0)
+    if bootstrapStat is not None:
+        stats["ciLower"], stats["ciUpper"] = bootstrapInterval(values, bootstrapStat, numResamples,
+                                                               confidenceLevel, rngSeed)
+    return stats
+
+def getBandStats(band):
+    """
+        Names of the statistics that bound a band: "quantiles" for the
+        spread of the runs, "ci" for the bootstrap confidence interval
+        of the plotted statistic, None for no band.
+    """
+    if band is None:
+        return None
+    elif band == "quantiles":
+        return "qLower", "qUpper"
+    elif band == "ci":
+        return "ciLower", "ciUpper"
+    raise ValueError("No valid band supplied: {}".format(band))
+
+def getRunStats(runs, numColumns, stat="mean", band=None):
+    """
+        getColumnStats of a list of per-run results, with the bootstrap
+        interval of stat only when it is needed for the band.
+    """
+    if stat not in STATS:
+        raise ValueError("No valid statistic supplied: {}".format(stat))
+    bootstrapStat = stat if band == "ci" else None
+    return getColumnStats(stackRuns(runs, numColumns), bootstrapStat=bootstrapStat)
+
+def getBandColor(color):
+    """
+        Opaque light version of a color.
+    """
+    rgb = np.array(matplotlib.colors.to_rgb(color))
+    return tuple(BAND_COLOR_WEIGHT * rgb + (1 - BAND_COLOR_WEIGHT))
+
+def plotStat(stats, stat, band=None, linestyle="-", dashes=None, color=None):
+    """
+        Plot stat per column, with a band (see getBandStats) in the same
+        color: an opaque light fill below all lines, with thin edges so
+        overlapping bands stay visible.
+    """
+    xs = np.arange(len(stats[stat]))
+    if dashes is not None:
+        lines = plt.plot(xs, stats[stat], linestyle=linestyle, dashes=dashes, color=color)
+    else:
+        lines = plt.plot(xs, stats[stat], linestyle=linestyle, color=color)
+    bandStats = getBandStats(band)
+    if bandStats is not None:
+        lineColor = lines[0].get_color()
+        plt.fill_between(xs, stats[bandStats[0]], stats[bandStats[1]], color=getBandColor(lineColor),
+                         linewidth=0, zorder=0)
+        for bandStat in bandStats:
+            plt.plot(xs, stats[bandStat], color=lineColor, linewidth=0.5)
+    return lines
@@ -0,0 +1,121 @@
+import csv
+import os
+
+import numpy as np
+
+from .FileUtil import getFileState
+
+# Columnar store for the cumulative cases of all seeds of a scenario.
+# Packing a scenario writes three files next to <scenario>_seeds.csv:
+#   <scenario>_cases.npy         seed x timestep int32 matrix
+#   <scenario>_cases_state.npy   size and modification time of
+#                                <scenario>_seeds.csv when it was packed
+#   <scenario>_cases_seeds.npy   seed index (row i belongs to seed i)
+# The matrix is memory-mapped, so looking up seeds does not require opening
+# their cases.csv files. The store is used while the seeds file of the
+# scenario is unchanged, which is checked once per lookup rather than per
+# seed. Running a scenario again rewrites its seeds file; runs that are
+# regenerated on their own need to be packed again (see Util.ingestScenario).
+
+# Loaded stores per process, keyed by matrix path
+_stores = {}
+
+def getStorePaths(outputDir, scenarioName):
+    casesFile = os.path.join(outputDir, scenarioName + "_cases.npy")
+    stateFile = os.path.join(outputDir, scenarioName + "_cases_state.npy")
+    seedsFile = os.path.join(outputDir, scenarioName + "_cases_seeds.npy")
+    return casesFile, stateFile, seedsFile
+
+def getRngSeedsFile(outputDir, scenarioName):
+    return os.path.join(outputDir, scenarioName + "_seeds.csv")
+
+def getRunCasesFile(outputDir, scenarioName, seed):
+    return os.path.join(outputDir, scenarioName + "_" + str(seed), "cases.csv")
+
+def readCasesFile(casesFile):
+    """
+        Read the cumulative cases from a cases.csv file,
+        one value per timestep.
+    """
+    cases = []
+    with open(casesFile) as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            cases.append(int(row["cases"]))
+    return cases
+
+def packScenario(outputDir, scenarioName, seeds):
+    """
+        Pack the cases.csv files of all given seeds of a scenario into
+        one seed x timestep matrix. Runs that are shorter than the longest
+        run are padded with their last value.
+    """
+    state = getFileState(getRngSeedsFile(outputDir, scenarioName))
+    allCases = [readCasesFile(getRunCasesFile(outputDir, scenarioName, s)) for s in seeds]
+    numTimesteps = max([len(cases) for cases in allCases] + [0])
+    matrix = np.zeros((len(allCases), numTimesteps), dtype=np.int32)
+    for row_i in range(len(allCases)):
+        cases = allCases[row_i]
+        if len(cases) > 0:
+            matrix[row_i, :len(cases)] = cases
+            matrix[row_i, len(cases):] = cases[-1]
+    casesFile, stateFile, seedsFile = getStorePaths(outputDir, scenarioName)
+    # Write the seed index last: a store is only used when all files exist
+    np.save(casesFile, matrix)
+    np.save(stateFile, np.array(state if state is not None else (-1, -1), dtype=np.int64))
+    np.save(seedsFile, np.array(seeds, dtype=np.int64))
+    _stores.pop(casesFile, None)
+    return matrix
+
+def loadScenarioStore(outputDir, scenarioName):
+    """
+        Return (seed -> row index, memory-mapped matrix) for a packed
+        scenario, or None when the scenario has not been packed or its
+        seeds file changed after it was packed.
+    """
+    casesFile, stateFile, seedsFile = getStorePaths(outputDir, scenarioName)
+    try:
+        mtime = os.path.getmtime(seedsFile)
+    except OSError:
+        return None
+    if casesFile not in _stores or _stores[casesFile][0] != mtime:
+        try:
+            seeds = np.load(seedsFile)
+            matrix = np.load(casesFile, mmap_mode="r")
+            state = tuple(np.load(stateFile).tolist())
+        except (OSError, ValueError):
+            # Not packed completely, or packed before the state file was added
+            return None
+        _stores[casesFile] = (mtime, state, ({int(s): i for i, s in enumerate(seeds)}, matrix))
+    _, state, store = _stores[casesFile]
+    if getFileState(getRngSeedsFile(outputDir, scenarioName)) not in (state, None):
+        return None
+    return store
+
+def getStoredCases(outputDir, scenarioName, seed):
+    """
+        Cumulative cases per timestep of one seed from the packed store,
+        or None when the scenario or seed is not in a valid store.
+    """
+    store = loadScenarioStore(outputDir, scenarioName)
+    if store is None:
+        return None
+    seedIndex, matrix = store
+    if int(seed) not in seedIndex:
+        return None
+    return matrix[seedIndex[int(seed)]]
+
+def getStoredRows(outputDir, scenarioName, seeds, numDays):
+    """
+        Memory-mapped matrix and the row of every seed in it, so columns can
+        be read for all seeds at once, e.g. matrix[rows, numDays - 1]. None
+        when the scenario is not in a valid store, a seed is missing or the
+        packed runs are shorter than numDays.
+    """
+    store = loadScenarioStore(outputDir, scenarioName)
+    if store is None:
+        return None
+    seedIndex, matrix = store
+    if numDays > matrix.shape[1] or any(int(s) not in seedIndex for s in seeds):
+        return None
+    return matrix, np.array([seedIndex[int(s)] for s in seeds], dtype=np.int64)
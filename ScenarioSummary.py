@@ -0,0 +1,208 @@
+import os
+
+import numpy as np
+
+from .ConfidenceIntervals import getProportionInterval
+from .FileUtil import getFileState
+from .RunStore import getRngSeedsFile, getRunCasesFile, getStoredRows
+from .Util import (getCumulativeCasesPerDay, getFinalOutbreakSize, getRngSeeds, getSusceptiblesAtStart,
+                   mapOverSeeds)
+
+# Summaries that were already computed in this process, keyed by
+# (outputDir, scenarioName, numDays), with the state of the files of the
+# scenario they were computed from
+_summaries = {}
+
+class ScenarioSummary:
+    """
+        Per-seed results of a scenario, read in one pass over
+        the output files of its seeds.
+    """
+    def __init__(self, seeds, finalSizes, cumulativeCases=None, susceptibles=None):
+        self.seeds = seeds
+        # Cumulative cases of each run at the last day
+        self.finalSizes = finalSizes
+        # runs x days matrix of cumulative cases, only read when needed
+        self.cumulativeCases = cumulativeCases
+        # Number of susceptibles at the start of each run
+        self.susceptibles = susceptibles
+
+    def getFinalSizes(self):
+        return self.finalSizes.tolist()
+
+    def getOutbreakMask(self, extinctionThreshold):
+        return self.finalSizes >= extinctionThreshold
+
+    def getOutbreaks(self, extinctionThreshold):
+        return self.getOutbreakMask(extinctionThreshold).astype(int).tolist()
+
+    def getFractionOutbreaks(self, extinctionThreshold):
+        return sum(self.getOutbreaks(extinctionThreshold)) / len(self.seeds)
+
+    def getOutbreakInterval(self, extinctionThreshold, confidenceLevel=95, method="wilson"):
+        """
+            Confidence interval (lower, upper) for the fraction of runs
+            that result in an outbreak.
+        """
+        numOutbreaks = int(self.getOutbreakMask(extinctionThreshold).sum())
+        return getProportionInterval(numOutbreaks, len(self.seeds), confidenceLevel, method)
+
+    def getOutbreakSizes(self, extinctionThreshold):
+        """
+            Final sizes of the runs that are not below
+            the extinction threshold.
+        """
+        return self.finalSizes[self.getOutbreakMask(extinctionThreshold)].tolist()
+
+    def getEscapeProbabilities(self, extinctionThreshold):
+        """
+            Fraction of susceptibles that escaped infection
+            for every run that is not below the extinction threshold.
+        """
+        mask = self.getOutbreakMask(extinctionThreshold)
+        totalInfected = self.finalSizes[mask]
+        totalSusceptible = self.susceptibles[mask]
+        # If no-one is susceptible, escape probability is 1
+        escaped = np.ones(len(totalInfected))
+        nonZero = totalSusceptible > 0
+        escaped[nonZero] = (totalSusceptible[nonZero] - totalInfected[nonZero]) / totalSusceptible[nonZero]
+        return escaped.tolist()
+
+    def getCumulativeCases(self, extinctionThreshold):
+        """
+            Cumulative cases per day of the runs that are not below
+            the extinction threshold (see getScenarioSummaries withCurves).
+        """
+        return self.cumulativeCases[self.getOutbreakMask(extinctionThreshold)]
+
+    def getNewCases(self, extinctionThreshold):
+        """
+            New cases per day of the runs that are not below
+            the extinction threshold.
+        """
+        cumulativeCases = self.getCumulativeCases(extinctionThreshold)
+        return np.diff(cumulativeCases, axis=1, prepend=1)
+
+def getFinalSize(outputDir, scenarioName, seed, numDays):
+    """
+        Cumulative cases at numDays, or the last cumulative cases
+        of a run that did not get to numDays.
+    """
+    finalSize = getFinalOutbreakSize(outputDir, scenarioName, seed, numDays)
+    if finalSize is None:
+        cumulativeCases = getCumulativeCasesPerDay(outputDir, scenarioName, seed, numDays)
+        finalSize = cumulativeCases[-1] if len(cumulativeCases) > 0 else 0
+    return finalSize
+
+def summarizeSeed(outputDir, scenarioName, seed, numDays, withFinalSize, withSusceptibles, withCurves):
+    finalSize = None
+    susceptibles = None
+    cumulativeCases = None
+    if withFinalSize:
+        finalSize = getFinalSize(outputDir, scenarioName, seed, numDays)
+    if withSusceptibles:
+        susceptibles = getSusceptiblesAtStart(outputDir, scenarioName, seed)
+    if withCurves:
+        cumulativeCases = getCumulativeCasesPerDay(outputDir, scenarioName, seed, numDays)
+    return finalSize, susceptibles, cumulativeCases
+
+def toCasesMatrix(curves, numDays):
+    cumulativeCases = np.zeros((len(curves), numDays), dtype=np.int64)
+    for run_i in range(len(curves)):
+        run = curves[run_i]
+        cumulativeCases[run_i, :len(run)] = run
+        # Runs that stopped early keep their final size
+        cumulativeCases[run_i, len(run):] = run[-1] if len(run) > 0 else 0
+    return cumulativeCases
+
+def getScenarioState(outputDir, scenarioName):
+    """
+        Size and modification time of the seeds file and
+        of the cases.csv of every seed of a scenario.
+    """
+    seeds = getRngSeeds(outputDir, scenarioName)
+    return seeds, (getFileState(getRngSeedsFile(outputDir, scenarioName)),) + tuple(
+        getFileState(getRunCasesFile(outputDir, scenarioName, s)) for s in seeds)
+
+def readStoredCases(outputDir, scenarioName, seeds, numDays, withFinalSize, withCurves):
+    """
+        Final sizes and/or cases matrix of all seeds of a scenario from its
+        packed store (see RunStore), read for all seeds at once, or None
+        when the scenario is not in a valid store.
+    """
+    stored = getStoredRows(outputDir, scenarioName, seeds, numDays)
+    if stored is None:
+        return None
+    matrix, rows = stored
+    finalSizes = matrix[rows, numDays - 1].astype(np.int64) if withFinalSize else None
+    cumulativeCases = matrix[rows, :numDays].astype(np.int64) if withCurves else None
+    return finalSizes, cumulativeCases
+
+def getScenarioSummaries(outputDir, scenarioNames, numDays, poolSize, withSusceptibles=False, withCurves=False):
+    """
+        Get the summaries of a list of scenarios. The seeds of all scenarios
+        that were not summarized before, or whose seeds file or cases.csv
+        files changed since, are read as one flat task queue. The final sizes
+        are read from the end of the cases.csv files, the susceptibles.csv
+        files are only read when withSusceptibles is set and the full
+        cases.csv files only when withCurves is set. The final sizes and
+        curves of a packed scenario are read from its store instead.
+    """
+    keys = [(os.path.abspath(outputDir), scn, numDays) for scn in scenarioNames]
+    # Per scenario to read: whether the final sizes, susceptibles and curves are needed
+    toRead = {}
+    states = {}
+    for scn, key in zip(scenarioNames, keys):
+        if scn in toRead:
+            continue
+        seeds, state = getScenarioState(outputDir, scn)
+        states[scn] = (seeds, state)
+        if key not in _summaries or _summaries[key][0] != state:
+            _summaries.pop(key, None)
+            toRead[scn] = (True, withSusceptibles, withCurves)
+            continue
+        summary = _summaries[key][1]
+        missingSusceptibles = withSusceptibles and summary.susceptibles is None
+        missingCurves = withCurves and summary.cumulativeCases is None
+        if missingSusceptibles or missingCurves:
+            toRead[scn] = (False, missingSusceptibles, missingCurves)
+    # Read what is in the packed stores for all seeds of a scenario at once
+    for scn, (withFinalSize, missingSusceptibles, missingCurves) in list(toRead.items()):
+        if not (withFinalSize or missingCurves):
+            continue
+        seeds, state = states[scn]
+        stored = readStoredCases(outputDir, scn, seeds, numDays, withFinalSize, missingCurves)
+        if stored is None:
+            continue
+        key = (os.path.abspath(outputDir), scn, numDays)
+        if withFinalSize:
+            _summaries[key] = (state, ScenarioSummary(seeds, stored[0]))
+        if missingCurves:
+            _summaries[key][1].cumulativeCases = stored[1]
+        if missingSusceptibles:
+            toRead[scn] = (False, True, False)
+        else:
+            del toRead[scn]
+    # Group the scenarios by what they miss, so every group is one task queue
+    groups = {}
+    for scn, needed in toRead.items():
+        groups.setdefault(needed, []).append(scn)
+    for needed, groupNames in groups.items():
+        allResults = mapOverSeeds(summarizeSeed, outputDir, groupNames, poolSize, (numDays,) + needed)
+        for scn, results in zip(groupNames, allResults):
+            seeds, state = states[scn]
+            key = (os.path.abspath(outputDir), scn, numDays)
+            if needed[0]:
+                _summaries[key] = (state, ScenarioSummary(seeds, np.array([r[0] for r in results], dtype=np.int64)))
+            summary = _summaries[key][1]
+            if needed[1]:
+                summary.susceptibles = np.array([r[1] for r in results])
+            if needed[2]:
+                summary.cumulativeCases = toCasesMatrix([r[2] for r in results], numDays)
+    return [_summaries[key][1] for key in keys]
+
+def getScenarioSummary(outputDir, scenarioName, numDays, poolSize, withSusceptibles=False, withCurves=False):
+    return getScenarioSummaries(outputDir, [scenarioName], numDays, poolSize, withSusceptibles, withCurves)[0]
+
+def clearScenarioSummaries():
+    _summaries.clear()
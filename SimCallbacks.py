@@ -0,0 +1,389 @@
+import csv
+import os
+import resource
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from pystride.Event import EventType
+
+
+# Written to the output directory of a run that was stopped before num_days
+STOP_FILE = "stopped.txt"
+
+# Whether a callback of the current run of this process called stopSimulation
+_stop = {"requested": False}
+
+
+class StopSimulation(Exception):
+    """
+        Raised by stopSimulation to end the current run.
+    """
+    pass
+
+
+def stopSimulation():
+    """
+        End the current run from a callback. Callbacks must have written
+        their output before, the Finished event does not follow.
+    """
+    _stop["requested"] = True
+    raise StopSimulation()
+
+
+def runControl(control, onStop=None):
+    """
+        Run the simulation of control until num_days, or until a callback
+        calls stopSimulation. Finished callbacks are not called for a
+        stopped run, onStop() is called instead. Returns whether the run was
+        stopped.
+
+        The stop is recognized by a flag rather than by the exception type,
+        as the exception passes through the stepping loop of Stride: it
+        may come out of control() converted to another exception, or be
+        reported and dropped, after which control() returns once the
+        remaining (then ignored) time-steps are done.
+    """
+    _stop["requested"] = False
+    try:
+        control.control()
+    except Exception:
+        if not _stop["requested"]:
+            raise
+    if not _stop["requested"]:
+        return False
+    if onStop is not None:
+        onStop()
+    return True
+
+
+def getMaxInfectionDays(diseaseFile):
+    """
+        Upper bound on the number of days between infection and the end of
+        infectiousness, from the cumulative distributions of the disease
+        configuration (the last entry of each is reached with probability 1).
+        Infectiousness starts no later than the onset of symptoms.
+    """
+    root = ET.parse(diseaseFile).getroot()
+    maxStartSymptomatic = len(root.find("start_symptomatic").findall("probability")) - 1
+    maxTimeInfectious = len(root.find("time_infectious").findall("probability")) - 1
+    return maxStartSymptomatic + maxTimeInfectious
+
+
+class CaseTracker:
+    """
+        Callback object to track cumulative cases after each time-step.
+        Cases are kept in a preallocated array and written to cases.csv
+        at the end of the run, or every flushInterval time-steps.
+
+        The run is stopped early when the cumulative number of cases has not
+        changed for quietDays time-steps (the outbreak has died out if
+        quietDays is at least getMaxInfectionDays), or when it reaches
+        maxCases. The remaining time-steps are then written with the last
+        number of cases, so cases.csv always covers num_days, and the stop
+        time-step is written to STOP_FILE, before the run is stopped. Later
+        time-steps of a stopped run are ignored. Use runControl to run the
+        simulation.
+    """
+
+    def __init__(self, flushInterval=None, quietDays=None, maxCases=None):
+        self.flushInterval = flushInterval
+        self.quietDays = quietDays
+        self.maxCases = maxCases
+        self.stopTimestep = None
+        self.outputPrefix = None
+        self.cases = None
+        self.numRecorded = 0  # Number of time-steps recorded in this run
+        self.numFlushed = 0  # Number of time-steps already written to cases.csv
+
+    def register(self, control):
+        control.registerCallback(self.track, EventType.Stepped)
+        control.registerCallback(self.finish, EventType.Finished)
+
+    def start(self, simulator):
+        self.outputPrefix = simulator.GetConfigValue("run.output_prefix")
+        numDays = int(simulator.GetConfigValue("run.num_days"))
+        self.cases = np.zeros(numDays, dtype=np.int64)
+        self.numRecorded = 0
+        self.numFlushed = 0
+        self.stopTimestep = None
+        try:
+            os.remove(os.path.join(self.outputPrefix, STOP_FILE))
+        except OSError:
+            pass
+
+    def track(self, simulator, event):
+        timestep = event.timestep
+        if timestep == 0 or self.cases is None:
+            self.start(simulator)
+        elif self.stopTimestep is not None:
+            return
+        if timestep >= len(self.cases):
+            self.cases = np.concatenate([self.cases, np.zeros(len(self.cases), dtype=np.int64)])
+        self.cases[timestep] = simulator.GetPopulation().GetInfectedCount()
+        self.numRecorded = timestep + 1
+        if self.shouldStop(timestep):
+            self.stop(timestep)
+        if self.numRecorded == len(self.cases):
+            self.flush()
+        elif self.flushInterval and self.numRecorded - self.numFlushed >= self.flushInterval:
+            self.flush()
+
+    def shouldStop(self, timestep):
+        if self.numRecorded == len(self.cases):
+            return False
+        if self.maxCases is not None and self.cases[timestep] >= self.maxCases:
+            return True
+        if self.quietDays is not None and timestep >= self.quietDays:
+            return self.cases[timestep] == self.cases[timestep - self.quietDays]
+        return False
+
+    def stop(self, timestep):
+        self.stopTimestep = timestep
+        self.cases[timestep + 1:] = self.cases[timestep]
+        self.numRecorded = len(self.cases)
+        self.flush()
+        with open(os.path.join(self.outputPrefix, STOP_FILE), "w") as f:
+            f.write(str(timestep) + "\n")
+        stopSimulation()
+
+    def finish(self, simulator, event):
+        self.flush()
+
+    def flush(self):
+        if self.cases is None or self.numFlushed == self.numRecorded:
+            return
+        mode = "w" if self.numFlushed == 0 else "a"
+        with open(os.path.join(self.outputPrefix, "cases.csv"), mode) as csvfile:
+            writer = csv.writer(csvfile)
+            if self.numFlushed == 0:
+                writer.writerow(["timestep", "cases"])
+            for timestep in range(self.numFlushed, self.numRecorded):
+                writer.writerow([timestep, self.cases[timestep]])
+        self.numFlushed = self.numRecorded
+
+
+class TargetedVaccination:
+    """
+        Callback object that sets the members of a pool type (e.g. 2 for
+        College) within an age range immune at a given time-step. The target
+        persons are selected with one scan of the population at that
+        time-step, and their indices are kept in targets, so the population
+        is not scanned again and every target is set immune only once.
+        With reuseTargets, the targets of the first run are also used in
+        later runs, which is only valid when all runs share the same
+        population and pool memberships.
+    """
+
+    def __init__(self, timestep, poolType, minAge=None, maxAge=None, reuseTargets=False):
+        self.timestep = timestep
+        self.poolType = poolType
+        self.minAge = minAge
+        self.maxAge = maxAge
+        self.reuseTargets = reuseTargets
+        self.targets = None
+        self.applied = False
+
+    def register(self, control):
+        control.registerCallback(self.apply, EventType.Stepped)
+
+    def isTarget(self, person):
+        poolId = person.GetPoolId(self.poolType)  # 0 if the person is not in a pool of this type
+        if poolId == 0 or not person.IsInPool(poolId):
+            return False
+        age = person.GetAge()
+        if self.minAge is not None and age < self.minAge:
+            return False
+        if self.maxAge is not None and age > self.maxAge:
+            return False
+        return True
+
+    def selectTargets(self, population):
+        return np.array([i for i in range(population.size()) if self.isTarget(population[i])], dtype=np.int64)
+
+    def apply(self, simulator, event):
+        if event.timestep < self.timestep:
+            # Earlier time-step of a new run
+            self.applied = False
+            return
+        if self.applied:
+            return
+        population = simulator.GetPopulation()
+        if self.targets is None or not self.reuseTargets:
+            self.targets = self.selectTargets(population)
+        for i in self.targets:
+            population[int(i)].GetHealth().SetImmune()
+        self.applied = True
+
+
+# Columns of the per-timestep profile of a run
+STEP_PROFILE_COLUMNS = ["timestep", "step_seconds", "overhead_seconds", "rss_bytes", "major_faults", "cases"]
+
+STEP_PROFILE_FILE = "steps.csv"
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def getResidentBytes():
+    """
+        Resident set size of this process. Without /proc (e.g. on macOS),
+        the peak resident set size is used instead.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        maxRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return maxRss if sys.platform == "darwin" else maxRss * 1024
+
+
+class StepProfiler:
+    """
+        Callback object that records for every time-step the wall-clock time
+        of the step, the time spent in profiled callbacks (see wrap) and in
+        the profiler itself, the resident set size of the process, the number
+        of major page faults (pages read from disk, e.g. swapping) and the
+        cumulative number of cases. The profile is kept in a preallocated
+        array and written to steps.csv once, at the end of the run.
+
+        The step time of a time-step runs from the end of the previous
+        Stepped callbacks, so callbacks that are not wrapped count as
+        stepping. Register the profiler after the callbacks it wraps, so
+        their time is counted in the same time-step. Use runControl(control, onStop=profiler.flush) when runs
+        can be stopped early.
+    """
+
+    def __init__(self):
+        self.outputPrefix = None
+        self.profile = None
+        self.numRecorded = 0
+        self.flushed = True
+        self.lastTime = None
+        self.overhead = 0.0
+        self.lastFaults = 0
+
+    def register(self, control):
+        control.registerCallback(self.startRun, EventType.AtStart)
+        control.registerCallback(self.record, EventType.Stepped)
+        control.registerCallback(self.finish, EventType.Finished)
+
+    def wrap(self, callback):
+        """
+            Wrap a callback so its time is counted as overhead instead of
+            stepping, e.g. control.registerCallback(profiler.wrap(f), EventType.Stepped).
+        """
+        def profiledCallback(simulator, event):
+            start = time.perf_counter()
+            try:
+                callback(simulator, event)
+            finally:
+                self.overhead += time.perf_counter() - start
+        return profiledCallback
+
+    def startRun(self, simulator, event):
+        self.start(simulator)
+
+    def start(self, simulator):
+        if not self.flushed:
+            # The previous run was stopped without flush
+            self.flush()
+        self.outputPrefix = simulator.GetConfigValue("run.output_prefix")
+        numDays = int(simulator.GetConfigValue("run.num_days"))
+        self.profile = np.zeros((numDays, len(STEP_PROFILE_COLUMNS)))
+        self.numRecorded = 0
+        self.flushed = False
+        self.overhead = 0.0
+        self.lastFaults = resource.getrusage(resource.RUSAGE_SELF).ru_majflt
+        self.lastTime = time.perf_counter()
+
+    def record(self, simulator, event):
+        now = time.perf_counter()
+        timestep = event.timestep
+        if timestep == 0 and self.numRecorded > 0 or self.profile is None:
+            # A new run without an AtStart event
+            self.start(simulator)
+            self.lastTime = None
+        if timestep >= len(self.profile):
+            self.profile = np.concatenate([self.profile, np.zeros(self.profile.shape)])
+        faults = resource.getrusage(resource.RUSAGE_SELF).ru_majflt
+        row = self.profile[timestep]
+        row[0] = timestep
+        row[1] = now - self.lastTime - self.overhead if self.lastTime is not None else np.nan
+        row[3] = getResidentBytes()
+        row[4] = faults - self.lastFaults
+        row[5] = simulator.GetPopulation().GetInfectedCount()
+        self.numRecorded = timestep + 1
+        self.lastFaults = faults
+        self.lastTime = time.perf_counter()
+        row[2] = self.overhead + (self.lastTime - now)
+        self.overhead = 0.0
+
+    def finish(self, simulator, event):
+        self.flush()
+
+    def flush(self):
+        if self.flushed or self.profile is None:
+            return
+        np.savetxt(os.path.join(self.outputPrefix, STEP_PROFILE_FILE), self.profile[:self.numRecorded],
+                   fmt=["%d", "%.6f", "%.6f", "%d", "%d", "%d"], delimiter=",",
+                   header=",".join(STEP_PROFILE_COLUMNS), comments="")
+        self.flushed = True
+
+
+def readStepProfile(runDir):
+    """
+        Per-timestep profile of a run (see StepProfiler) as a
+        dictionary of column name -> array.
+    """
+    profile = np.loadtxt(os.path.join(runDir, STEP_PROFILE_FILE), delimiter=",", skiprows=1, ndmin=2)
+    return {name: profile[:, i] for i, name in enumerate(STEP_PROFILE_COLUMNS)}
+
+
+def summarizeStepProfile(profile):
+    """
+        Totals of a run profile, the correlation between the step time and
+        the number of new cases of a step, and the first time-step with
+        major page faults (-1 when there were none).
+    """
+    steps = profile["step_seconds"]
+    measured = ~np.isnan(steps)
+    newCases = np.diff(profile["cases"], prepend=0)
+    correlation = np.nan
+    if measured.sum() > 1 and np.std(steps[measured]) > 0 and np.std(newCases[measured]) > 0:
+        correlation = np.corrcoef(steps[measured], newCases[measured])[0, 1]
+    faulting = np.flatnonzero(profile["major_faults"] > 0)
+    return {
+        "num_steps": len(steps),
+        "step_seconds": float(steps[measured].sum()),
+        "max_step_seconds": float(steps[measured].max()) if measured.any() else np.nan,
+        "overhead_seconds": float(profile["overhead_seconds"].sum()),
+        "max_rss_bytes": int(profile["rss_bytes"].max()) if len(steps) > 0 else 0,
+        "major_faults": int(profile["major_faults"].sum()),
+        "first_fault_timestep": int(profile["timestep"][faulting[0]]) if len(faulting) > 0 else -1,
+        "cases": int(profile["cases"][-1]) if len(steps) > 0 else 0,
+        "step_cases_correlation": float(correlation),
+    }
+
+
+def aggregateStepProfiles(runDirs, summaryFile):
+    """
+        Write the summary (see summarizeStepProfile) of the profile of every
+        run of a sweep to summaryFile, one row per run directory.
+        Runs without a profile are skipped.
+    """
+    rows = []
+    for runDir in runDirs:
+        if os.path.isfile(os.path.join(runDir, STEP_PROFILE_FILE)):
+            summary = summarizeStepProfile(readStepProfile(runDir))
+            summary["run"] = runDir
+            rows.append(summary)
+    fieldNames = ["run", "num_steps", "step_seconds", "max_step_seconds", "overhead_seconds", "max_rss_bytes",
+                  "major_faults", "first_fault_timestep", "cases", "step_cases_correlation"]
+    with open(summaryFile, "w") as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=fieldNames)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
@@ -0,0 +1,158 @@
+import os
+import re
+from datetime import datetime
+
+import pandas as pd
+
+# Every run writes a stride_log.txt with lines like
+#   [2019-06-19 17:08:46.371] [stride_logger] [info]    SimRunner at start:
+# The messages that mark the start and end of the phases of a run are
+# turned into phase durations (in seconds):
+#   startup     start of the log until the population is built or loaded
+#   population  building or loading the population, including geopop
+#   geopop      building the geopopulation ("Building geopop." until
+#               "Done building geopop."), 0 for an imported population
+#   stepping    all simulated days ("SimRunner at start:" until the last day)
+#   output      the last day until shutdown (final output and viewers)
+# Logs of a controller that runs several seeds at once ("Starting run using
+# seed N" ... "For run with seed N final infected count is: ...") only have
+# a start and end per seed, so only their total is known.
+
+LOG_FILE_NAME = "stride_log.txt"
+
+PHASES = ["startup", "population", "geopop", "stepping", "output", "total"]
+
+LINE_PATTERN = re.compile(r"^\[(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\.\d+)\] \[[^\]]*\] \[[^\]]*\] (.*)$")
+
+DAY_PATTERN = re.compile(r"Day:\s*(\d+)\s+Done")
+
+SEED_START_PATTERN = re.compile(r"Starting run using seed (\d+)")
+
+SEED_END_PATTERN = re.compile(r"For run with seed (\d+) final")
+
+CONFIG_SEED_PATTERN = re.compile(r"<rng_seed>\s*(\d+)\s*</rng_seed>")
+
+POPULATION_START_MESSAGES = ["Invoking GeoPopBuilder.", "Building geopop.", "Reading population"]
+
+def readLogLines(logFile):
+    """
+        Timestamp (in seconds) and message of every timestamped line,
+        and the rng seed of the run configuration in the log (or None).
+    """
+    lines = []
+    seed = None
+    with open(logFile) as f:
+        for line in f:
+            match = LINE_PATTERN.match(line)
+            if match is None:
+                # Continuation lines, e.g. the run configuration
+                if seed is None:
+                    seedMatch = CONFIG_SEED_PATTERN.search(line)
+                    if seedMatch is not None:
+                        seed = int(seedMatch.group(1))
+                continue
+            timestamp = datetime.strptime(match.group(1), "%Y-%m-%d %H:%M:%S.%f").timestamp()
+            lines.append((timestamp, match.group(2).strip()))
+    return lines, seed
+
+def findMessage(lines, prefixes):
+    """
+        Timestamp of the first line whose message starts with one of prefixes, or None.
+    """
+    for timestamp, message in lines:
+        if any(message.startswith(p) for p in prefixes):
+            return timestamp
+    return None
+
+def getDuration(start, end):
+    if start is None or end is None:
+        return float("nan")
+    return end - start
+
+def getRunTimings(lines, seed):
+    """
+        Phase durations and day step statistics of the run of a single-run log.
+    """
+    start = lines[0][0]
+    end = lines[-1][0]
+    populationStart = findMessage(lines, POPULATION_START_MESSAGES)
+    geopopStart = findMessage(lines, ["Building geopop."])
+    geopopEnd = findMessage(lines, ["Done building geopop."])
+    simStart = findMessage(lines, ["SimRunner at start:"])
+    days = [timestamp for timestamp, message in lines if DAY_PATTERN.search(message)]
+    simEnd = days[-1] if days else findMessage(lines, ["SimRunner done after:"])
+    if populationStart is None:
+        populationStart = simStart
+    steps = [b - a for a, b in zip([simStart] + days[:-1], days)] if simStart is not None else []
+    timings = {
+        "seed": seed,
+        "startup": getDuration(start, populationStart),
+        "population": getDuration(populationStart, simStart),
+        "geopop": getDuration(geopopStart, geopopEnd) if geopopStart is not None else 0.0,
+        "stepping": getDuration(simStart, simEnd),
+        "output": getDuration(simEnd, end),
+        "total": end - start,
+        "numDays": len(days),
+        "meanStep": sum(steps) / len(steps) if steps else float("nan"),
+        "maxStep": max(steps) if steps else float("nan"),
+        "slowestDay": steps.index(max(steps)) if steps else None,
+    }
+    return [timings]
+
+def getSeedTimings(lines):
+    """
+        Total duration per seed of a log of several runs.
+    """
+    starts = {}
+    timings = []
+    for timestamp, message in lines:
+        match = SEED_START_PATTERN.search(message)
+        if match is not None:
+            starts[int(match.group(1))] = timestamp
+            continue
+        match = SEED_END_PATTERN.search(message)
+        if match is not None and int(match.group(1)) in starts:
+            seed = int(match.group(1))
+            timings.append({"seed": seed, "total": timestamp - starts[seed]})
+    return timings
+
+def parseStrideLog(logFile):
+    """
+        Timings (see PHASES) of every run in a stride_log.txt,
+        as a list with one dictionary per run.
+    """
+    lines, seed = readLogLines(logFile)
+    if len(lines) == 0:
+        return []
+    if any(SEED_START_PATTERN.search(message) for _, message in lines):
+        return getSeedTimings(lines)
+    return getRunTimings(lines, seed)
+
+def findStrideLogs(outputDir):
+    logFiles = []
+    for root, dirs, files in os.walk(outputDir):
+        dirs.sort()
+        if LOG_FILE_NAME in files:
+            logFiles.append(os.path.join(root, LOG_FILE_NAME))
+    return logFiles
+
+def getTimingTable(outputDir):
+    """
+        Table with the timings of all runs of all stride_log.txt files
+        below outputDir, one row per run. The "run" column is the
+        directory of the log relative to outputDir.
+    """
+    rows = []
+    for logFile in findStrideLogs(outputDir):
+        run = os.path.relpath(os.path.dirname(logFile), outputDir)
+        for timings in parseStrideLog(logFile):
+            timings["run"] = run
+            rows.append(timings)
+    columns = ["run", "seed"] + PHASES + ["numDays", "meanStep", "maxStep", "slowestDay"]
+    return pd.DataFrame(rows, columns=columns)
+
+def getSlowestRuns(table, phase="total", numRuns=10):
+    """
+        The numRuns rows of a timing table with the longest phase.
+    """
+    return table.sort_values(phase, ascending=False).head(numRuns)
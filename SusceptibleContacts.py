@@ -0,0 +1,107 @@
+import os
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from .AgeCounts import readColumns
+from .ContactLog import readTagFields
+from .Util import mapOverSeeds, saveFig
+
+# A [CONT] record of a log of contacts between susceptibles is logged as:
+# [CONT] <person id> <contact id> ...
+# The contacts are turned into an undirected graph in compressed sparse row
+# form: the neighbours of person i are indices[indptr[i]:indptr[i + 1]].
+
+def readContacts(logFile):
+    """
+        Person ids of both persons of every [CONT] record of a contact log.
+    """
+    fields = readTagFields(logFile, "[CONT]")
+    if len(fields) == 0:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+    return fields[:, 0].astype(np.int32), fields[:, 1].astype(np.int32)
+
+def buildContactGraph(persons, contacts, numPersons=None):
+    """
+        CSR adjacency (indptr, indices) of the undirected graph with an edge
+        for every contact, without self-loops and duplicate edges.
+    """
+    if numPersons is None:
+        numPersons = int(max(persons.max(), contacts.max())) + 1 if len(persons) > 0 else 0
+    sources = np.concatenate([persons, contacts]).astype(np.int64)
+    targets = np.concatenate([contacts, persons]).astype(np.int64)
+    different = sources != targets
+    # Sorting on source * numPersons + target orders the edges by source
+    keys = np.unique(sources[different] * numPersons + targets[different])
+    indices = (keys % numPersons).astype(np.int32)
+    counts = np.bincount(keys // numPersons, minlength=numPersons)
+    indptr = np.zeros(numPersons + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, indices
+
+def getComponentLabels(indptr, indices):
+    """
+        Connected component of every person, labelled by its lowest person id.
+        Union-find on all edges at once: every pass links the root of the
+        higher label of an edge to the lower one, after which the paths to
+        the roots are compressed by pointer jumping.
+    """
+    numPersons = len(indptr) - 1
+    sources = np.repeat(np.arange(numPersons, dtype=np.int32), np.diff(indptr))
+    parent = np.arange(numPersons, dtype=np.int32)
+    while True:
+        sourceRoots = parent[sources]
+        targetRoots = parent[indices]
+        lower = np.minimum(sourceRoots, targetRoots)
+        higher = np.maximum(sourceRoots, targetRoots)
+        linked = lower != higher
+        if not linked.any():
+            return parent
+        parent[higher[linked]] = lower[linked]
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+def getComponentSizes(indptr, indices, persons=None):
+    """
+        Sizes of the connected components, largest first. Only the given
+        persons are counted (by default all persons with a contact), so
+        e.g. susceptibles without contacts count as components of size 1.
+    """
+    labels = getComponentLabels(indptr, indices)
+    if persons is None:
+        persons = np.flatnonzero(np.diff(indptr) > 0)
+    sizes = np.bincount(labels[persons], minlength=len(labels))
+    return np.sort(sizes[sizes > 0])[::-1]
+
+def getSusceptibleComponentSizes(outputDir, scenarioName, seed, withIsolated=False):
+    """
+        Sizes of the groups of susceptibles that are connected by contacts
+        in the contact log of a run, largest first. With withIsolated, the
+        susceptibles from susceptibles.csv (in person id order) without any
+        contact are included as groups of size 1.
+    """
+    logFile = os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt")
+    persons, contacts = readContacts(logFile)
+    numPersons = None
+    susceptibles = None
+    if withIsolated:
+        susceptiblesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "susceptibles.csv")
+        susceptible, = readColumns(susceptiblesFile, ["susceptible"])
+        numPersons = len(susceptible)
+        susceptibles = np.flatnonzero(susceptible)
+    indptr, indices = buildContactGraph(persons, contacts, numPersons)
+    return getComponentSizes(indptr, indices, susceptibles).tolist()
+
+def createLargestComponentPlot(outputDir, scenarioNames, scenarioDisplayNames, poolSize, figName):
+    """
+        Boxplot of the size of the largest group of connected
+        susceptibles of every run of each scenario.
+    """
+    allSizes = mapOverSeeds(getSusceptibleComponentSizes, outputDir, scenarioNames, poolSize)
+    largest = [[sizes[0] if len(sizes) > 0 else 0 for sizes in scenarioSizes] for scenarioSizes in allSizes]
+    plt.boxplot(largest, labels=scenarioDisplayNames)
+    plt.ylabel("Largest group of connected susceptibles")
+    saveFig(outputDir, figName)
@@ -0,0 +1,158 @@
+import itertools
+import json
+import multiprocessing
+import os
+import shutil
+
+from pystride.PyController import PyController
+
+# Controller of this worker process and the configuration it was created for
+_controller = {"key": None, "control": None}
+
+# Configuration with the geopop_gen parameters of the generated Flanders population
+GENERATE_CONFIG_FILE = os.path.join("config", "run_generate_default.xml")
+
+
+def expandGrid(paramGrid):
+    """
+        Turn a dictionary of parameter name -> list of values
+        into a list with one dictionary of parameters per run.
+    """
+    names = list(paramGrid.keys())
+    values = [list(paramGrid[name]) for name in names]
+    return [dict(zip(names, combination)) for combination in itertools.product(*values)]
+
+
+def getRunKey(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def readManifest(manifestFile):
+    """
+        Keys of the runs that were completed in earlier sweeps.
+    """
+    completed = set()
+    if os.path.isfile(manifestFile):
+        with open(manifestFile) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    completed.add(getRunKey(json.loads(line)))
+    return completed
+
+
+def appendManifest(manifestFile, params):
+    with open(manifestFile, "a") as f:
+        f.write(json.dumps(params, sort_keys=True) + "\n")
+
+
+def generateGeoPopulation(geopopFile, params=None, configFile=GENERATE_CONFIG_FILE, dataDir="data"):
+    """
+        Generate the geopopulation of a run configuration, with the given
+        parameters (e.g. geopop_gen.fraction_workplace_commuters) set, and
+        write it to geopopFile, unless that file already exists. Only the
+        population is built, the simulation runs for 0 days. Returns the
+        absolute path of geopopFile.
+
+        The file is written under a temporary name and then moved, so a
+        worker never imports a partial file. Workers that generate the same
+        file at once write identical files, the rng seed is not changed.
+    """
+    geopopFile = os.path.abspath(geopopFile)
+    if os.path.isfile(geopopFile):
+        return geopopFile
+    root, ext = os.path.splitext(geopopFile)
+    # Stride picks the file format from the extension
+    tmpFile = "{}.{}.tmp{}".format(root, os.getpid(), ext)
+    outputPrefix = "{}.{}.tmp".format(root, os.getpid())
+    control = PyController(data_dir=dataDir)
+    control.loadRunConfig(configFile)
+    for name, value in (params or {}).items():
+        control.runConfig.setParameter(name, value)
+    control.runConfig.setParameter("population_type", "generate")
+    control.runConfig.setParameter("population_file", tmpFile)
+    control.runConfig.setParameter("num_days", 0)
+    control.runConfig.setParameter("output_prefix", outputPrefix)
+    control.runConfig.setParameter("output_cases", "false")
+    control.runConfig.setParameter("contact_output_file", "false")
+    control.control()
+    os.replace(tmpFile, geopopFile)
+    shutil.rmtree(outputPrefix, ignore_errors=True)
+    return geopopFile
+
+
+def importGeoPopulation(control, geopopFile):
+    """
+        Let the next run of control import its population from a
+        geopopulation file (see generateGeoPopulation) instead of building it.
+    """
+    control.runConfig.setParameter("population_type", "import")
+    control.runConfig.setParameter("geopopulation_file", os.path.abspath(geopopFile))
+
+
+def getController(configFile, setup=None, dataDir="data"):
+    """
+        Get the PyController of this worker process for a configuration file.
+        It is created once, with setup(control) to register callbacks, and
+        reused by all following runs of the worker. The run configuration is
+        reloaded from file before every run. To skip building the population
+        of every run, generate it once and import it (see importGeoPopulation).
+        The controller of a run that was stopped early is not reused (see
+        releaseController).
+    """
+    key = (configFile, dataDir)
+    if _controller["key"] != key:
+        control = PyController(data_dir=dataDir)
+        if setup is not None:
+            setup(control)
+        _controller["key"] = key
+        _controller["control"] = control
+    control = _controller["control"]
+    control.loadRunConfig(configFile)
+    return control
+
+
+def releaseController():
+    """
+        Drop the controller of this worker process, so the next run gets a
+        new one. Use runControl(control, onStop=releaseController): a
+        controller whose control() was ended by an exception from a
+        callback is not used again.
+    """
+    _controller["key"] = None
+    _controller["control"] = None
+
+
+def _runTask(task):
+    runFunc, params, numThreads = task
+    runFunc(numThreads=numThreads, **params)
+    return params
+
+
+def runSweep(runFunc, paramGrid, manifestFile, poolSize=None, numThreads=1):
+    """
+        Call runFunc(**params, numThreads=numThreads) for every run of a
+        parameter sweep, spread over a pool of worker processes. Each worker
+        runs one simulation (with its own PyController) at a time, and
+        poolSize * numThreads should not exceed the number of cores.
+        Completed runs are appended to manifestFile, runs that are already
+        in it are skipped so an interrupted sweep can be resumed.
+
+        paramGrid is either a dictionary of parameter name -> list of values
+        or a list of parameter dictionaries.
+    """
+    if isinstance(paramGrid, dict):
+        runs = expandGrid(paramGrid)
+    else:
+        runs = list(paramGrid)
+    if poolSize is None:
+        poolSize = max(1, multiprocessing.cpu_count() // numThreads)
+    completed = readManifest(manifestFile)
+    toRun = [params for params in runs if getRunKey(params) not in completed]
+    print("Sweep: {} runs, {} already completed".format(len(runs), len(runs) - len(toRun)))
+    if len(toRun) == 0:
+        return
+    with multiprocessing.Pool(processes=poolSize) as pool:
+        for params in pool.imap_unordered(_runTask, [(runFunc, p, numThreads) for p in toRun]):
+            # Only the parent writes to the manifest
+            appendManifest(manifestFile, params)
@@ -0,0 +1,93 @@
+import json
+import multiprocessing
+import os
+
+# ConfidenceIntervals is one of the analysis modules, but it has no
+# package-relative imports so that it can also be imported as a top-level
+# module from here, next to the simulation scripts.
+from ConfidenceIntervals import wilsonInterval
+
+
+def readResults(resultsFile):
+    """
+        Outcomes of earlier probes, as a dictionary of level -> {seed: outbreak}.
+    """
+    results = {}
+    if os.path.isfile(resultsFile):
+        with open(resultsFile) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    result = json.loads(line)
+                    results.setdefault(result["level"], {})[result["seed"]] = result["outbreak"]
+    return results
+
+
+def appendResult(resultsFile, level, seed, outbreak):
+    with open(resultsFile, "a") as f:
+        f.write(json.dumps({"level": level, "seed": seed, "outbreak": outbreak}, sort_keys=True) + "\n")
+
+
+def _probeTask(task):
+    outbreakFunc, level, seed, numThreads = task
+    return seed, bool(outbreakFunc(level, seed, numThreads=numThreads))
+
+
+def findCriticalLevel(outbreakFunc, lower, upper, resultsFile, targetFraction=0.5, tolerance=0.1,
+                      numSeeds=10, maxSeeds=40, confidenceLevel=95, poolSize=None, numThreads=1):
+    """
+        Bisection search for the (immunity) level in [lower, upper] at which
+        the fraction of runs that result in an outbreak drops below
+        targetFraction. The fraction is assumed to decrease with the level,
+        to be above targetFraction at lower and below it at upper.
+
+        outbreakFunc(level, seed, numThreads=numThreads) runs one simulation
+        and returns whether it resulted in an outbreak. Every probed level gets
+        seeds 1..numSeeds, run in parallel on a pool of poolSize processes
+        (by default the number of cores divided by numThreads). When the confidence
+        interval of its outbreak fraction still contains targetFraction,
+        numSeeds more seeds are run, up to maxSeeds, after which the
+        observed fraction decides. Outcomes are appended to resultsFile and
+        reused for levels that were already evaluated, also by later searches
+        (e.g. with a smaller tolerance).
+
+        Returns the critical level (the middle of the final bracket) and a
+        confidence interval for it: the highest evaluated level whose outbreak
+        fraction is significantly above targetFraction and the lowest one that
+        is significantly below it (lower and upper when there are none).
+    """
+    if poolSize is None:
+        poolSize = max(1, multiprocessing.cpu_count() // numThreads)
+    results = readResults(resultsFile)
+    confidentAbove = lower
+    confidentBelow = upper
+    with multiprocessing.Pool(processes=poolSize) as pool:
+
+        def probe(level, seeds):
+            outcomes = results.setdefault(level, {})
+            tasks = [(outbreakFunc, level, seed, numThreads) for seed in seeds if seed not in outcomes]
+            for seed, outbreak in pool.imap_unordered(_probeTask, tasks):
+                outcomes[seed] = outbreak
+                # Only the parent writes to the results file
+                appendResult(resultsFile, level, seed, outbreak)
+            numOutbreaks = sum(outcomes[seed] for seed in seeds)
+            return numOutbreaks / len(seeds), wilsonInterval(numOutbreaks, len(seeds), confidenceLevel)
+
+        while upper - lower > tolerance:
+            level = round((lower + upper) / 2, 10)
+            numProbeSeeds = numSeeds
+            fraction, (ciLower, ciUpper) = probe(level, range(1, numProbeSeeds + 1))
+            while ciLower <= targetFraction <= ciUpper and numProbeSeeds < maxSeeds:
+                numProbeSeeds = min(numProbeSeeds + numSeeds, maxSeeds)
+                fraction, (ciLower, ciUpper) = probe(level, range(1, numProbeSeeds + 1))
+            print("Threshold search: level {}, outbreak fraction {:.2f} ({} seeds)".format(
+                level, fraction, numProbeSeeds))
+            if fraction > targetFraction:
+                lower = level
+                if ciLower > targetFraction:
+                    confidentAbove = max(confidentAbove, level)
+            else:
+                upper = level
+                if ciUpper < targetFraction:
+                    confidentBelow = min(confidentBelow, level)
+    return (lower + upper) / 2, (confidentAbove, confidentBelow)
@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+
+from .ContactLog import readTagFields
+
+# A [TRAN] record is logged as: [TRAN] <infected id> <infector id> <pool type> <day>
+# and every index case that is seeded as a [PRIM] record with -1 for the
+# fields that do not apply, so its id is the first non-negative of the
+# first two fields.
+
+def readTransmissions(logFile):
+    """
+        Read the [TRAN] records of a contact log into arrays of
+        infected ids, infector ids and days of infection.
+    """
+    fields = readTagFields(logFile, "[TRAN]")
+    if len(fields) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+    return fields[:, 0].astype(np.int64), fields[:, 1].astype(np.int64), fields[:, -1].astype(np.int32)
+
+def readIndexCases(logFile):
+    """
+        Ids of the index cases in the [PRIM] records of a contact log.
+    """
+    fields = readTagFields(logFile, "[PRIM]")
+    if len(fields) == 0:
+        return np.empty(0, dtype=np.int64)
+    first = fields[:, 0].astype(np.int64)
+    return np.where(first >= 0, first, fields[:, 1].astype(np.int64))
+
+def getNumPersons(infected, infectors, indexCases):
+    return int(max(infected.max(initial=-1), infectors.max(initial=-1), indexCases.max(initial=-1))) + 1
+
+def getGenerations(infected, infectors, numPersons, indexCases=None):
+    """
+        Generation of every person in the transmission tree: 0 for index
+        cases (indexCases, and infectors that were not infected by anyone in
+        the log), generation of the infector + 1 for infected persons and
+        -1 for persons that do not occur in the tree.
+    """
+    generations = np.full(numPersons, -1, dtype=np.int32)
+    wasInfected = np.zeros(numPersons, dtype=bool)
+    wasInfected[infected] = True
+    generations[infectors[~wasInfected[infectors]]] = 0
+    if indexCases is not None:
+        generations[indexCases] = 0
+    # Every pass assigns the next generation
+    while True:
+        todo = (generations[infectors] >= 0) & (generations[infected] < 0)
+        if not todo.any():
+            break
+        generations[infected[todo]] = generations[infectors[todo]] + 1
+    return generations
+
+def getRByGeneration(infected, infectors, indexCases=None):
+    """
+        Mean number of secondary infections caused by the cases of each
+        generation, for the generations that have cases. Index cases that
+        infected no-one are only known from indexCases (e.g. the seeded
+        persons of readIndexCases).
+    """
+    if indexCases is None:
+        indexCases = np.empty(0, dtype=np.int64)
+    if len(infected) == 0 and len(indexCases) == 0:
+        return []
+    numPersons = getNumPersons(infected, infectors, indexCases)
+    generations = getGenerations(infected, infectors, numPersons, indexCases)
+    cases = generations[generations >= 0]
+    casesPerGeneration = np.bincount(cases)
+    # The secondary infections of generation g are the cases of generation g + 1
+    secondary = np.append(casesPerGeneration[1:], 0)
+    return (secondary / casesPerGeneration).tolist()
+
+def getRByDay(infected, infectors, days, numDays, indexCases=None):
+    """
+        Mean number of secondary infections caused by the persons that were
+        infected on each day (0 for days without new infections). Index
+        cases (indexCases, and infectors without a [TRAN] record of their
+        own) count as infected on day 0.
+    """
+    if indexCases is None:
+        indexCases = np.empty(0, dtype=np.int64)
+    if len(infected) == 0 and len(indexCases) == 0:
+        return [0.0] * numDays
+    numPersons = getNumPersons(infected, infectors, indexCases)
+    infectionDays = np.full(numPersons, -1, dtype=np.int32)
+    infectionDays[infectors] = 0
+    infectionDays[indexCases] = 0
+    infectionDays[infected] = days
+    secondary = np.bincount(infectors, minlength=numPersons)
+    cases = infectionDays >= 0
+    casesPerDay = np.bincount(infectionDays[cases], minlength=numDays)[:numDays]
+    secondaryPerDay = np.bincount(infectionDays[cases], weights=secondary[cases], minlength=numDays)[:numDays]
+    R = np.zeros(numDays)
+    np.divide(secondaryPerDay, casesPerDay, out=R, where=(casesPerDay > 0))
+    return R.tolist()
+
+def getEffectiveRByGeneration(outputDir, scenarioName, seed):
+    transmissionsFile = os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt")
+    infected, infectors, days = readTransmissions(transmissionsFile)
+    return getRByGeneration(infected, infectors, readIndexCases(transmissionsFile))
+
+def getEffectiveRByDay(outputDir, scenarioName, seed, numDays):
+    transmissionsFile = os.path.join(outputDir, scenarioName + "_" + str(seed) + "_contact_log.txt")
+    infected, infectors, days = readTransmissions(transmissionsFile)
+    return getRByDay(infected, infectors, days, numDays, readIndexCases(transmissionsFile))
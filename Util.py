@@ -1,18 +1,96 @@
+import atexit
 import csv
+import multiprocessing
+import multiprocessing.pool
 import os
 
 import matplotlib.pyplot as plt
 
+from .FileUtil import readLastLines
+from .ResultCache import cachedPerSeed
+from .RunStore import getStoredCases, packScenario
+
 MAX_AGE = 99
 
+# Worker pools shared by all analyses in this process, keyed by pool size
+_pools = {}
+
+def scanCasesAtTimestep(casesFile, timestep):
+    with open(casesFile) as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            if int(row["timestep"]) == timestep:
+                return int(row["cases"])
+
+def getCasesAtTimestep(casesFile, timestep):
+    """
+        Get the cumulative cases at a timestep from a cases.csv file.
+        There is one row per timestep, so the row is found by seeking back
+        from the end of the file instead of parsing all rows before it.
+        Falls back to a full scan when the file is not in the expected format.
+    """
+    try:
+        with open(casesFile) as csvfile:
+            header = csvfile.readline().strip().split(",")
+        timestepCol = header.index("timestep")
+        casesCol = header.index("cases")
+        lastTimestep = int(readLastLines(casesFile, 1)[0].split(",")[timestepCol])
+        if 0 <= timestep <= lastTimestep:
+            row = readLastLines(casesFile, lastTimestep - timestep + 1)[0].split(",")
+            if int(row[timestepCol]) == timestep:
+                return int(row[casesCol])
+        elif timestep > lastTimestep:
+            # The run did not get to this timestep
+            return None
+    except (ValueError, IndexError):
+        pass
+    return scanCasesAtTimestep(casesFile, timestep)
+
+@cachedPerSeed("{run}/cases.csv", "{scenario}_cases_seeds.npy")
 def getFinalOutbreakSize(outputDir, scenarioName, seed, numDays):
+    storedCases = getStoredCases(outputDir, scenarioName, seed)
+    if storedCases is not None and numDays <= len(storedCases):
+        return int(storedCases[numDays - 1])
     casesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "cases.csv")
+    return getCasesAtTimestep(casesFile, numDays - 1)
+
+@cachedPerSeed("{run}/cases.csv", "{scenario}_cases_seeds.npy")
+def getCumulativeCasesPerDay(outputDir, scenarioName, seed, numDays):
+    storedCases = getStoredCases(outputDir, scenarioName, seed)
+    if storedCases is not None:
+        return storedCases[:numDays].tolist()
+    casesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "cases.csv")
+    cumulativeCases = []
     with open(casesFile) as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
             timestep = int(row["timestep"])
-            if timestep == (numDays - 1):
-                return int(row["cases"])
+            if timestep < numDays:
+                cumulativeCases.append(int(row["cases"]))
+        return cumulativeCases
+
+@cachedPerSeed("{run}/susceptibles.csv")
+def getSusceptiblesAtStart(outputDir, scenarioName, seed):
+    totalSusceptible = 0
+    susceptiblesFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "susceptibles.csv")
+    with open(susceptiblesFile) as csvfile:
+        reader = csv.DictReader(csvfile)
+        for row in reader:
+            if int(row["susceptible"]):
+                totalSusceptible += 1
+    return totalSusceptible
+
+def getStopTimestep(outputDir, scenarioName, seed):
+    """
+        Time-step at which a run was stopped before num_days (see
+        SimCallbacks.CaseTracker), or None if it ran to the end.
+        The cases.csv of a stopped run is padded up to num_days.
+    """
+    stopFile = os.path.join(outputDir, scenarioName + "_" + str(seed), "stopped.txt")
+    if not os.path.isfile(stopFile):
+        return None
+    with open(stopFile) as f:
+        return int(f.read())
 
 def getRngSeeds(outputDir, scenarioName):
     seeds = []
@@ -24,6 +102,76 @@ def getRngSeeds(outputDir, scenarioName):
                 seeds.append(int(s))
     return seeds
 
+def ingestScenario(outputDir, scenarioName):
+    """
+        Pack the cases.csv files of all seeds of a scenario into
+        a columnar store, which is then used by the get* helpers
+        instead of the per-seed files.
+    """
+    packScenario(outputDir, scenarioName, getRngSeeds(outputDir, scenarioName))
+
+def getPool(poolSize):
+    """
+        Get the long-lived worker pool for the given pool size.
+        A pool that was created by the caller can be passed instead of a size.
+    """
+    if isinstance(poolSize, multiprocessing.pool.Pool):
+        return poolSize
+    if poolSize not in _pools:
+        _pools[poolSize] = multiprocessing.Pool(processes=poolSize)
+    return _pools[poolSize]
+
+def closePools():
+    for pool in _pools.values():
+        pool.close()
+        pool.join()
+    _pools.clear()
+
+atexit.register(closePools)
+
+def _runTask(task):
+    i, func, args = task
+    return i, func(*args)
+
+def mapTasks(func, argsList, poolSize, chunksize=None, numWorkers=None):
+    """
+        Equivalent of pool.starmap(func, argsList) on the shared pool.
+        Tasks are dispatched in chunks as they finish, results are returned
+        in the order of argsList. The default chunk size depends on the
+        number of workers, which is poolSize when it is a size, and the
+        default size of a pool (the number of CPUs) otherwise.
+    """
+    pool = getPool(poolSize)
+    if chunksize is None:
+        if numWorkers is None:
+            numWorkers = poolSize if isinstance(poolSize, int) else os.cpu_count()
+        chunksize = max(1, len(argsList) // (4 * numWorkers))
+    results = [None] * len(argsList)
+    tasks = [(i, func, argsList[i]) for i in range(len(argsList))]
+    for i, result in pool.imap_unordered(_runTask, tasks, chunksize):
+        results[i] = result
+    return results
+
+def mapOverSeeds(func, outputDir, scenarioNames, poolSize, extraArgs=()):
+    """
+        Call func(outputDir, scenarioName, seed, *extraArgs) for all seeds
+        of all scenarios as one flat task queue.
+        Returns a list of per-seed results for each scenario.
+    """
+    argsList = []
+    numSeeds = []
+    for scenario in scenarioNames:
+        seeds = getRngSeeds(outputDir, scenario)
+        argsList += [(outputDir, scenario, s) + tuple(extraArgs) for s in seeds]
+        numSeeds.append(len(seeds))
+    results = mapTasks(func, argsList, poolSize)
+    allResults = []
+    start = 0
+    for n in numSeeds:
+        allResults.append(results[start:start + n])
+        start += n
+    return allResults
+
 def saveFig(outputDir, figName):
     plt.savefig(os.path.join(outputDir, figName + ".eps"), format='eps', dpi=1000)
     plt.clf()
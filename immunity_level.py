@@ -1,27 +1,13 @@
 import csv
 import matplotlib.pyplot as plt
-from matplotlib import pyplot as mp
 import os
 
-from pystride.Event import Event, EventType
-from pystride.PyController import PyController
+from SimCallbacks import CaseTracker, getMaxInfectionDays, runControl
+from SweepRunner import generateGeoPopulation, getController, importGeoPopulation, releaseController, runSweep
 
 
-def trackCases(simulator, event):
-    """
-        Callback function to track cumulative cases
-        after each time-step.
-    """
-    outputPrefix = simulator.GetConfigValue("run.output_prefix")
-    timestep = event.timestep
-    cases = simulator.GetPopulation().GetInfectedCount()
-
-    with open(os.path.join(outputPrefix, "cases.csv"), "a") as csvfile:
-        fieldnames = ["timestep", "cases"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if timestep == 0:
-            writer.writeheader()
-        writer.writerow({"timestep": timestep, "cases": cases})
+# Generated population of all runs (see SweepRunner.generateGeoPopulation)
+GEOPOP_FILE = "flanders_geopop.proto"
 
 
 def plotNewCases(outputPrefix, vaccinationLevels):
@@ -49,20 +35,23 @@ def plotNewCases(outputPrefix, vaccinationLevels):
     plt.show()
 
 
-def runSimulation(outputPrefix, vaccinationLevel):
-    # Set up simulator
-    control = PyController(data_dir="data")
-    # Load configuration from file
-    control.loadRunConfig(os.path.join("config", "outbreak_2019_estimates.xml"))
+def runSimulation(outputPrefix, vaccinationLevel, numThreads=None):
+    # Set up simulator and load configuration from file
+    quietDays = getMaxInfectionDays(os.path.join("data", "disease_measles.xml"))
+    control = getController(os.path.join("config", "outbreak_2019_estimates.xml"),
+                            setup=CaseTracker(quietDays=quietDays).register)
+    # The Flanders geopopulation is generated once and imported by every run
+    importGeoPopulation(control, generateGeoPopulation(GEOPOP_FILE))
     # Set some parameters
     control.runConfig.setParameter("vaccine_rate", vaccinationLevel / 100)
     control.runConfig.setParameter("output_cases", "false")
     control.runConfig.setParameter("contact_output_file", "false")
     control.runConfig.setParameter("output_prefix", outputPrefix + "_" + str(vaccinationLevel))
     control.runConfig.setParameter("seeding_rate", 0.00000334)  # Seed 2 infected persons in population of 600 000
-    control.registerCallback(trackCases, EventType.Stepped)
-    # Run simulation
-    control.control()
+    if numThreads:
+        control.runConfig.setParameter("num_threads", numThreads)
+    # Run simulation, stopping once the outbreak has died out
+    runControl(control, onStop=releaseController)
 
 
 def main():
@@ -70,15 +59,9 @@ def main():
     # vaccinationLevels = [60, 65, 66.1, 66.15, 66.2, 67, 70, 80]
     vaccinationLevels = [61, 70, 78, 80]
 
-    for nr in vaccinationLevels:
-        try:  # FIRST DELETE DIRECTORY FILES, BEFORE ADDING VALUES
-            os.remove(outputPrefix + '_' + str(nr) + '/cases.csv')
-        except OSError:
-            pass
-
-    # Run simulations
-    for v in vaccinationLevels:
-        runSimulation(outputPrefix, v)
+    # Run simulations, runs that were completed before are skipped
+    runSweep(runSimulation, {"outputPrefix": [outputPrefix], "vaccinationLevel": vaccinationLevels},
+             outputPrefix + "_sweep.jsonl")
     # Post-processing
     plotNewCases(outputPrefix, vaccinationLevels)
 
@@ -1,30 +1,21 @@
 import csv
 import matplotlib.pyplot as plt
-from matplotlib import pyplot as mp
 import os
+import sys
 
-from pystride.Event import Event, EventType
-from pystride.PyController import PyController
+from functools import partial
 
+from FileUtil import readLastLines
+from SimCallbacks import CaseTracker, getMaxInfectionDays, runControl
+from SweepRunner import generateGeoPopulation, getController, importGeoPopulation, releaseController, runSweep
+from ThresholdSearch import findCriticalLevel
 
-def trackCases(simulator, event):
-    """
-        Callback function to track cumulative cases
-        after each time-step.
-    """
-    outputPrefix = simulator.GetConfigValue("run.output_prefix")
-    timestep = event.timestep
-    cases = simulator.GetPopulation().GetInfectedCount()
 
-    with open(os.path.join(outputPrefix, "cases.csv"), "a") as csvfile:
-        fieldnames = ["timestep", "cases"]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        if timestep == 0:
-            writer.writeheader()
-        writer.writerow({"timestep": timestep, "cases": cases})
+# Generated population of all runs (see SweepRunner.generateGeoPopulation)
+GEOPOP_FILE = "flanders_geopop.proto"
 
 
-def runSim(outputPrefix, vacRate=None, immRate=None, r0=None, rngSeed=None):
+def runSim(outputPrefix, vacRate=None, immRate=None, r0=None, rngSeed=None, numThreads=None):
 
     try:  # FIRST DELETE DIRECTORY FILES, BEFORE ADDING VALUES
         os.remove(outputPrefix + "_" + str(vacRate) + "_" + str(immRate) + "_"
@@ -32,11 +23,13 @@ def runSim(outputPrefix, vacRate=None, immRate=None, r0=None, rngSeed=None):
     except OSError:
         pass
 
-    # Set up simulator
-    control = PyController(data_dir="data")
-
-    # Load configuration from file
-    control.loadRunConfig(os.path.join("config", "outbreak_2019_estimates.xml"))
+    # Set up simulator and load configuration from file. The controller
+    # of this process is reused, with its callbacks registered once
+    quietDays = getMaxInfectionDays(os.path.join("data", "disease_measles.xml"))
+    control = getController(os.path.join("config", "outbreak_2019_estimates.xml"),
+                            setup=CaseTracker(quietDays=quietDays).register)
+    # The Flanders geopopulation is generated once and imported by every run
+    importGeoPopulation(control, generateGeoPopulation(GEOPOP_FILE))
 
     # Set some parameters
     control.runConfig.setParameter("output_prefix", outputPrefix + "_" +
@@ -60,10 +53,37 @@ def runSim(outputPrefix, vacRate=None, immRate=None, r0=None, rngSeed=None):
         control.runConfig.setParameter("r0", r0)
     if rngSeed:
         control.runConfig.setParameter("rng_seed", rngSeed)
+    if numThreads:
+        control.runConfig.setParameter("num_threads", numThreads)
+
+    # Run simulation, stopping once the outbreak has died out
+    runControl(control, onStop=releaseController)
+
+
+def runSimOutbreak(outputPrefix, r0, extinctionThreshold, immRate, rngSeed, numThreads=None):
+    """
+        Run a simulation and return whether its final number of cases
+        reaches extinctionThreshold.
+    """
+    runSim(outputPrefix, immRate=immRate, r0=r0, rngSeed=rngSeed, numThreads=numThreads)
+    casesFile = os.path.join(outputPrefix + "_None_" + str(immRate) + "_" + str(r0) + "_"
+                             + str(rngSeed), "cases.csv")
+    # cases.csv is padded to the last day, also when the run stopped early
+    finalCases = int(readLastLines(casesFile, 1)[0].split(",")[1])
+    return finalCases >= extinctionThreshold
+
 
-    control.registerCallback(trackCases, EventType.Stepped)
-    # Run simulation
-    control.control()
+def findCriticalLevels(outputPrefix, r0s, extinctionThreshold, numThreads=1):
+    """
+        Find the immunity level at which half of the runs result in an
+        outbreak, for each R0. Probes are saved per R0, so an interrupted
+        search resumes where it stopped.
+    """
+    for r0 in r0s:
+        level, (levelLower, levelUpper) = findCriticalLevel(
+            partial(runSimOutbreak, outputPrefix, r0, extinctionThreshold), 60, 100,
+            outputPrefix + "_" + str(r0) + "_threshold.jsonl", numThreads=numThreads)
+        print("R0 {}: critical immunity level {:.2f} ({:.2f} - {:.2f})".format(r0, level, levelLower, levelUpper))
 
 
 def plotImmAvg(outputPrefix, vacRate=None, immRate=None, r0=None, seeds=None):
@@ -211,11 +231,18 @@ if __name__ == "__main__":
     rng_seeds = range(1, 11)
     r0s = range(12, 19)
 
-    # for lvl in immunityLevels:
-    # for r0 in r0s:
-    #     for seed in rng_seeds:
-    #         runSim("AVG", immRate=lvl, rngSeed=seed)
-    plotImmAvgMultiR0("AVG", immRate=70.8, r0s=r0s,  seeds=rng_seeds)
-    # plotImmAvgAll("AVG", immRates=immunityLevels,  seeds=rng_seeds)
+    # "threshold" searches the critical immunity level per R0, "sweep" runs
+    # all immunity levels before plotting; without arguments the existing
+    # runs are plotted
+    command = sys.argv[1] if len(sys.argv) > 1 else "plot"
+    if command == "threshold":
+        findCriticalLevels("THR", r0s, 100)
+    else:
+        if command == "sweep":
+            # Runs that were completed before are skipped
+            runSweep(runSim, {"outputPrefix": ["AVG"], "immRate": immunityLevels, "r0": r0s,
+                              "rngSeed": rng_seeds}, "AVG_sweep.jsonl")
+        plotImmAvgMultiR0("AVG", immRate=70.8, r0s=r0s,  seeds=rng_seeds)
+        # plotImmAvgAll("AVG", immRates=immunityLevels,  seeds=rng_seeds)
 
 
@@ -3,26 +3,25 @@ import pandas as pd
 import numpy as np
 import sys
 
-def averageCumulative(file, amount_of_days, amount_of_simulations, name):
-    data = pd.read_csv(file)
+def loadRuns(file):
+    """
+        Load a stochastic analysis file as a (days x runs) matrix,
+        one column per simulation.
+    """
+    return pd.read_csv(file).to_numpy()
+
 
-    data_list = []
+def countOutbreaks(data, threshold=100):
+    return int(np.count_nonzero(data.max(axis=0) >= threshold))
 
-    for value in data:
-        data_list.append(data[value].copy())
 
-    outbreaks = 0
-    for data_points in data_list:
-        if max(data_points) >= 100:
-            outbreaks += 1
-    print("Amount of outbreaks for {}:".format(name), outbreaks)
+def averageCumulative(file, amount_of_days, amount_of_simulations, name):
+    data = loadRuns(file)
 
-    data_result = []
-    for i in range(amount_of_days):
-        value = 0
-        for j in range(amount_of_simulations):
-            value += int(data_list[j][i])
-        data_result.append(int(value / amount_of_simulations))
+    print("Amount of outbreaks for {}:".format(name), countOutbreaks(data))
+
+    total = data[:amount_of_days, :amount_of_simulations].sum(axis=1)
+    data_result = (total / amount_of_simulations).astype(int)
 
     return pd.Series(data_result, copy=True)
 
@@ -52,46 +51,24 @@ def average_of_files(files):
 
 
 def plot_cumulative_and_new_cases(file):
-    data = pd.read_csv(file)
-
-    data_cumulative = []
-    data_difference = []
-    data_difference_boxplot = []
+    data = loadRuns(file)
 
     boxplot_measure_interval = 10
     boxplot_diffrence_interval = 10
 
-    for col in data:
-        data_cumulative.append(data[col].copy())
-        data_difference.append(data[col].copy())
-
-    for _ in range(len(data_difference[0])):
-        data_difference_boxplot.append([])
-
-    for j in range(len(data_difference)):
-        data_array = data_difference[j]
-        length = len(data_array)
-        result = []
-        for i in range(length):
-            if i == 0:
-                result.append(data_array[i])
-                # if max(data_array) > 100:
-                #     data_difference_boxplot[i].append(data_array[i])
-
-            else:
-                result.append(data_array[i] - data_array[i - 1])
-                if i%boxplot_measure_interval == 0:
-                    if max(data_array) > 100:
-                        data_difference_boxplot[i].append((data_array[i] - data_array[i - boxplot_diffrence_interval])/boxplot_diffrence_interval)
-        data_difference[j] = pd.Series(result, copy=True)
+    # New cases per day, the first day counts all cases so far
+    data_difference = np.diff(data, axis=0, prepend=0)
+
+    # Average new cases per day over the last interval, every interval days,
+    # only for simulations with an outbreak
+    measure_days = np.arange(boxplot_measure_interval, len(data), boxplot_measure_interval)
+    outbreak_runs = data[:, data.max(axis=0) > 100]
+    data_difference_boxplot = (outbreak_runs[measure_days] - outbreak_runs[measure_days - boxplot_diffrence_interval]) \
+        / boxplot_diffrence_interval
 
     # Plot cumulative
-    outbreaks = 0
-    for data_points in data_cumulative:
-        if max(data_points) >= 100:
-            outbreaks += 1
-        data_points.plot(kind='line')
-    print("amount of outbreaks:", outbreaks)
+    plt.plot(data)
+    print("amount of outbreaks:", countOutbreaks(data))
 
     # print("Numer of outbreaks: {nr}".format(nr=outbreaks))
 
@@ -101,8 +78,7 @@ def plot_cumulative_and_new_cases(file):
     plt.close()  # clf
 
     # Plot difference
-    for data_points in data_difference:
-        data_points.plot(kind='line')
+    plt.plot(data_difference)
 
     plt.xlabel('Day in Simulation')
     plt.ylabel('Number of new infected cases')
@@ -111,12 +87,7 @@ def plot_cumulative_and_new_cases(file):
     plt.close()  # clf
 
     # Box plot
-    boxplot_data = []
-    for i in range(len(data_difference[0])):
-        if i%boxplot_measure_interval == 0 and i != 0:
-            boxplot_data.append(data_difference_boxplot[i])
-
-    plt.boxplot(boxplot_data)
+    plt.boxplot(list(data_difference_boxplot))
     if boxplot_measure_interval == 1:
         plt.xlabel('Number of days in simulation')
         plt.ylabel('Number of new infected cases')
@@ -128,16 +99,14 @@ def plot_cumulative_and_new_cases(file):
     plt.close()  # clf
 
     # Histogram with 2 bins (outbreaks/no outbreaks
-    plt.hist(data.iloc[[-1]].squeeze(), bins=2)
+    plt.hist(data[-1], bins=2)
     plt.xlabel('# of infected')
     plt.ylabel('# of simulations')
     plt.show()
 
 
 def final_freq_hist(file):
-    data = pd.read_csv(file)
-
-    final_frequencies = data.iloc[[-1]].squeeze().tolist()
+    final_frequencies = loadRuns(file)[-1]
 
     plt.hist(final_frequencies)
     plt.xlabel("Final size after {} days".format(500))
@@ -147,11 +116,9 @@ def final_freq_hist(file):
 
 
 def final_freq_bar(file, sorted=False):
-    data = pd.read_csv(file)
-
-    final_frequencies = data.iloc[[-1]].squeeze()
+    final_frequencies = loadRuns(file)[-1]
     if sorted:
-        final_frequencies = final_frequencies.sort_values()
+        final_frequencies = np.sort(final_frequencies)
 
     for i in range(100):
         print(final_frequencies[i])
@@ -1,25 +1,36 @@
 import csv
+import os
+
+
+def readLastRow(fileName, blockSize=8192):
+    """
+        Read only the last row of a csv file by seeking back from its end.
+    """
+    with open(fileName, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        while position > 0 and data.rstrip(b'\n').count(b'\n') < 1:
+            step = min(blockSize, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lastLine = data.rstrip(b'\n').split(b'\n')[-1].decode().rstrip('\r')
+    return next(csv.reader([lastLine], delimiter=','))
+
 
 if __name__ == '__main__':
 
-    with open('../smallflanders/stan_infected.csv') as csv_file:
-        csv_reader = csv.reader(csv_file, delimiter=',')
-        line_count = 0
-        for row in csv_reader:
-            # if line_count == 0:
-            #     print(f'Column names are {", ".join(row)}')
-            #     line_count += 1
-            # else:
-            lastrow = row
-
-        threshold = 600
-        nonOutbreaks = 0
-        outbreaks = 0
-
-        for i in range(len(row)):
-            if int(row[i]) < threshold:
-                nonOutbreaks += 1
-            else:
-                outbreaks += 1
-
-        print("Outbreaks: ", outbreaks, "\nNon-outbreaks: ", nonOutbreaks)
\ No newline at end of file
+    row = readLastRow('../smallflanders/stan_infected.csv')
+
+    threshold = 600
+    nonOutbreaks = 0
+    outbreaks = 0
+
+    for i in range(len(row)):
+        if int(row[i]) < threshold:
+            nonOutbreaks += 1
+        else:
+            outbreaks += 1
+
+    print("Outbreaks: ", outbreaks, "\nNon-outbreaks: ", nonOutbreaks)